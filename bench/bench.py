@@ -0,0 +1,253 @@
+#!/usr/bin/python3
+"""
+Copyright 2023 (C) Peter McGoron
+
+This file is a part of Upsilon, a free and open source software project.
+For license terms, refer to the files in `doc/copying` in the Upsilon
+source distribution.
+"""
+
+"""
+Benchmarks for the client library, the mmio code generator and the
+on-board library.
+
+    ./bench.py -o baseline.json
+    ./bench.py -o results.json --baseline baseline.json
+
+Each benchmark is timed with ``timeit``. The best and median time of one
+call are stored in seconds. With ``--baseline``, a benchmark whose best
+time is more than ``--threshold`` slower than the baseline is reported
+as a regression and the exit status is 1.
+
+The ``comm`` benchmarks run ``comm_bench.py`` under the MicroPython unix
+port, with a fake ``machine`` module and an ``mmio`` module generated
+from a fake CSR map. They are skipped when MicroPython is not installed.
+"""
+
+import os
+import io
+import sys
+import json
+import time
+import shutil
+import struct
+import timeit
+import argparse
+import platform
+import tempfile
+import statistics
+import subprocess
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+UPSILON_ROOT = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, os.path.join(UPSILON_ROOT, "client"))
+
+import util
+csr2mp = util.import_upsilon("gateware", "csr2mp")
+fake_board = util.import_upsilon("gateware", "fake_board")
+
+BENCHMARKS = {}
+
+def bench(name):
+    """
+    Register a benchmark. The decorated function does any setup and
+    returns the function that is timed.
+    """
+    def reg(f):
+        BENCHMARKS[name] = f
+        return f
+    return reg
+
+######## Client ########
+
+@bench("fixed_point.to_fixed")
+def bench_fixed_point_to_fixed():
+    return lambda: util.string_to_fixed_point("0.000612345", 43)
+
+@bench("fixed_point.to_string")
+def bench_fixed_point_to_string():
+    v = util.string_to_fixed_point("-12.000612345", 43)
+    return lambda: util.fixed_point_to_string(v, 43)
+
+@bench("decode.sign_extend_4096")
+def bench_decode_sign_extend_4096():
+    vals = [(i * 2654435761) & 0x3FFFF for i in range(4096)]
+    return lambda: [util.sign_extend(v, 18) for v in vals]
+
+@bench("decode.ram_shim_65536")
+def bench_decode_ram_shim_65536():
+    buf = bytes(range(256)) * 1024
+    return lambda: util.decode_ram_shim(buf).sum()
+
+@bench("decode.capture_1024")
+def bench_decode_capture_1024():
+    buf = bytes(range(256)) * 32
+    return lambda: util.decode_capture(buf)
+
+def _summary_records(n):
+    return [(i - n//2, 20, 1000*i, 50000*i) for i in range(n)]
+
+@bench("parse.text_600")
+def bench_parse_text_600():
+    text = "".join(f"S {d} {c} {s} {s2}\n" for d, c, s, s2 in _summary_records(600))
+    def run():
+        rows = []
+        for line in io.StringIO(text):
+            l = line.split(' ')
+            if l[0] == 'S':
+                rows.append((int(l[1]), int(l[2]), int(l[3]), int(l[4])))
+        return rows
+    return run
+
+@bench("parse.binary_600")
+def bench_parse_binary_600():
+    fmt = "<iiqq"
+    data = b"".join(struct.pack(fmt, *r) for r in _summary_records(600))
+    return lambda: list(struct.iter_unpack(fmt, data))
+
+@bench("parse.binary_numpy_600")
+def bench_parse_binary_numpy_600():
+    import numpy as np
+    dt = np.dtype([("dac", "<i4"), ("n", "<i4"), ("sum", "<i8"), ("sumsq", "<i8")])
+    data = b"".join(struct.pack("<iiqq", *r) for r in _summary_records(600))
+    return lambda: np.frombuffer(data, dtype=dt)
+
+######## Code generation ########
+
+_tmpdir = None
+
+def fake_csr():
+    """ :return: Path of a fake ``csr.json`` that lasts until exit. """
+    global _tmpdir
+    if _tmpdir is None:
+        _tmpdir = tempfile.TemporaryDirectory()
+        fake_board.write_fake_csr(os.path.join(_tmpdir.name, "csr.json"))
+    return os.path.join(_tmpdir.name, "csr.json")
+
+def _print_file(cls):
+    csrjson = fake_csr()
+    def run():
+        fake_board.generator(csrjson, cls).print_file()
+    return run
+
+@bench("csr2mp.print_file")
+def bench_csr2mp_print_file():
+    return _print_file(csr2mp.MicropythonGenerator)
+
+@bench("csr2mp.print_file_profile")
+def bench_csr2mp_print_file_profile():
+    return _print_file(csr2mp.ProfilingMicropythonGenerator)
+
+@bench("csr2mp.print_file_trace")
+def bench_csr2mp_print_file_trace():
+    return _print_file(csr2mp.TracingMicropythonGenerator)
+
+######## Runner ########
+
+def time_bench(f, repeat, min_time):
+    t = timeit.Timer(f)
+    number, _ = t.autorange()
+    number = max(1, int(number * min_time / 0.2))
+    times = [x / number for x in t.repeat(repeat, number)]
+    return {"best_s": min(times), "median_s": statistics.median(times),
+            "number": number}
+
+def run_comm(micropython, repeat):
+    """
+    :return: Dictionary of results, or ``None`` if MicroPython is not
+      installed.
+    """
+    if shutil.which(micropython) is None:
+        return None
+    with tempfile.TemporaryDirectory() as tmp:
+        with open(os.path.join(tmp, "mmio.py"), "w") as f:
+            fake_board.generator(fake_csr(), outf=f).print_file()
+        path = [fake_board.FAKE_DIR, tmp,
+                os.path.join(UPSILON_ROOT, "linux")]
+        env = dict(os.environ, MICROPYPATH=":".join(path))
+        out = subprocess.run([micropython, os.path.join(BENCH_DIR, "comm_bench.py"),
+                              str(repeat)], env=env, check=True,
+                             stdout=subprocess.PIPE).stdout
+    res = {}
+    for name, r in json.loads(out).items():
+        res[f"comm.{name}"] = {"best_s": r["best_us"] * 1e-6,
+                               "median_s": r["median_us"] * 1e-6,
+                               "number": r["number"]}
+    return res
+
+def compare(results, baseline, threshold):
+    """
+    :return: List of ``(name, ratio)`` for benchmarks that are more than
+      ``threshold`` slower than ``baseline``.
+    """
+    regressions = []
+    for name, r in sorted(results.items()):
+        b = baseline.get(name)
+        if b is None:
+            print(f"{name:32} {r['best_s']*1e6:12.2f} us", "(new)" if baseline else "")
+            continue
+        ratio = r["best_s"] / b["best_s"]
+        flag = ""
+        if ratio > 1 + threshold:
+            regressions.append((name, ratio))
+            flag = "REGRESSION"
+        print(f"{name:32} {r['best_s']*1e6:12.2f} us {ratio:6.2f}x {flag}")
+    return regressions
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description="Run the Upsilon benchmarks.")
+    p.add_argument("-o", "--output", help="write results to this JSON file")
+    p.add_argument("--baseline", help="JSON file of results to compare against")
+    p.add_argument("--threshold", type=float, default=0.2,
+                   help="allowed slowdown relative to the baseline (default 0.2)")
+    p.add_argument("--repeat", type=int, default=5, help="timing repetitions")
+    p.add_argument("--min-time", type=float, default=0.2,
+                   help="seconds each repetition should take")
+    p.add_argument("--micropython", default="micropython",
+                   help="MicroPython unix port executable")
+    p.add_argument("-k", dest="select", help="only run benchmarks containing this string")
+    args = p.parse_args(argv)
+
+    results = {}
+    for name, setup in BENCHMARKS.items():
+        if args.select and args.select not in name:
+            continue
+        results[name] = time_bench(setup(), args.repeat, args.min_time)
+
+    skipped = []
+    if not args.select or "comm" in args.select:
+        comm = run_comm(args.micropython, args.repeat)
+        if comm is None:
+            skipped.append("comm")
+            print(f"{args.micropython} not found: skipping comm benchmarks",
+                  file=sys.stderr)
+        else:
+            results.update(comm)
+
+    doc = {
+        "meta": {
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "node": platform.node(),
+            "skipped": skipped,
+        },
+        "results": results,
+    }
+    if args.output is not None:
+        with open(args.output, "w") as f:
+            json.dump(doc, f, indent=1)
+
+    baseline = {}
+    if args.baseline is not None:
+        with open(args.baseline) as f:
+            baseline = json.load(f)["results"]
+    regressions = compare(results, baseline, args.threshold)
+    if regressions:
+        print(f"{len(regressions)} regression(s) over {args.threshold:.0%}:",
+              ", ".join(n for n, _ in regressions))
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
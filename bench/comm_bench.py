@@ -0,0 +1,54 @@
+# Copyright 2023 (C) Peter McGoron
+# This file is a part of Upsilon, a free and open source software project.
+# For license terms, refer to the files in `doc/copying` in the Upsilon
+# source distribution.
+#
+# Time the comm library against a fake machine module. Run by bench.py:
+#
+#     MICROPYPATH=../gateware/fake:<mmio dir>:../linux micropython comm_bench.py [repeat]
+#
+# Prints a JSON object mapping each benchmark to the best and median
+# time of one call in microseconds.
+
+import sys
+import json
+from comm import *
+
+try:
+    from time import ticks_us, ticks_diff
+except ImportError:
+    from time import perf_counter_ns
+    def ticks_us():
+        return perf_counter_ns() // 1000
+    def ticks_diff(a, b):
+        return a - b
+
+def timeit(f, repeat, number):
+    times = []
+    for _ in range(repeat):
+        start = ticks_us()
+        for _ in range(number):
+            f()
+        times.append(ticks_diff(ticks_us(), start) / number)
+    times.sort()
+    return {"best_us": times[0], "median_us": times[len(times)//2],
+            "number": number}
+
+repeat = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+values = list(range(-512, 512))
+
+benchmarks = [
+    ("read_register", lambda: read_adc_recv_buf(0), 10000),
+    ("write_register", lambda: write_dac_send_buf(0, 0), 10000),
+    ("read_register_64", lambda: read_cl_P_in(), 10000),
+    ("dac_write_volt", lambda: dac_write_volt(-1000, 0), 2000),
+    ("dac_read_reg", lambda: dac_read_reg(1 << 21, 0), 2000),
+    ("adc_read", lambda: adc_read(0), 2000),
+    ("setpt_table_load_1024", lambda: setpt_table_load(values), 5),
+    ("capture_read_1024", lambda: capture_read(1024), 5),
+]
+
+res = {}
+for name, f, number in benchmarks:
+    res[name] = timeit(f, repeat, number)
+print(json.dumps(res))
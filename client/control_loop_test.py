@@ -6,21 +6,29 @@ For license terms, refer to the files in `doc/copying` in the Upsilon
 source distribution.
 """
 
-import numpy as np
-import matplotlib.pyplot as plt
-import pandas as pd
-import sys
-import signal
 from util import *
 
-Pval = string_to_fixed_point('0.0006', 43)
-Ival = string_to_fixed_point('0.01', 43)
+def main(setpt=10000, P='0.0006', I='0.01', delay=100):
+    """
+    Start the control loop on the board and print its output.
 
-out = connect_execute("control_loop_test.py", Pval, Ival, 10000, 100)
+    :param setpt: Setpoint in ADC units.
+    :param P: Proportional parameter as a decimal string.
+    :param I: Integral parameter as a decimal string.
+    :param delay: Delay between loop iterations, in cycles.
+    """
+    Pval = string_to_fixed_point(P, 43)
+    Ival = string_to_fixed_point(I, 43)
 
-################
-# Script Handler
-################
+    # The board script takes the setpoint, P, I and delay in that order.
+    out = connect_execute("control_loop_test.py", setpt, Pval, Ival, delay)
 
-for line in out.stdout:
-    print(line)
+    ################
+    # Script Handler
+    ################
+
+    for line in out.stdout:
+        print(line)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+"""
+Copyright 2023 (C) Peter McGoron
+
+This file is a part of Upsilon, a free and open source software project.
+For license terms, refer to the files in `doc/copying` in the Upsilon
+source distribution.
+"""
+
+import os
+import sys
+import importlib
+from types import SimpleNamespace, ModuleType
+from util import UPSILON_ROOT, import_upsilon
+
+mmio_descr = import_upsilon("gateware", "mmio_descr")
+
+def _finished_hook(finished):
+    """ Handshake: the SPI master finishes as soon as it is armed. """
+    def hook(regs, val, num):
+        regs.values[(finished, num)] = val & 1
+    return hook
+
+class FakeRegisters:
+    """
+    Register file that behaves like the generated ``mmio`` module without
+    hardware.
+
+    Values are masked to the register width, and signed registers read
+    back as signed integers. Handshakes that software waits on
+    (``adc_arm``, ``dac_arm``, ``cl_assert_change`` and ``cl_cap_arm``)
+    finish immediately. More behavior can be added with ``hooks``.
+    """
+    def __init__(self, registers=None):
+        """
+        :param registers: List of ``mmio_descr`` ``Descr``s. Defaults to
+          ``mmio_descr.registers``.
+        """
+        if registers is None:
+            registers = mmio_descr.registers
+        self.descr = {r.name: r for r in registers}
+        self.values = {}
+        for r in registers:
+            for i in self._nums(r):
+                self.values[(r.name, i)] = 0
+        self.hooks = {
+            "adc_arm": _finished_hook("adc_finished"),
+            "dac_arm": _finished_hook("dac_finished"),
+            "cl_assert_change": _finished_hook("cl_change_made"),
+            "cl_cap_arm": _finished_hook("cl_cap_finished"),
+        }
+
+    def _nums(self, r):
+        return [None] if r.num == 1 else range(r.num)
+
+    def _check(self, name, num):
+        r = self.descr[name]
+        if num not in self._nums(r):
+            raise Exception(num)
+        return r
+
+    def read(self, name, num=None):
+        r = self._check(name, num)
+        v = self.values[(name, num)]
+        if r.signed:
+            sign = 1 << (r.blen - 1)
+            v = (v ^ sign) - sign
+        return v
+
+    def write(self, name, val, num=None):
+        r = self._check(name, num)
+        if r.rwperm == "read-only":
+            raise Exception(f"{name} is read-only")
+        self.values[(name, num)] = val & ((1 << r.blen) - 1)
+        if name in self.hooks:
+            self.hooks[name](self, val, num)
+
+    def lookup(self, name):
+        """
+        :return: Tuple of read and write functions with the same
+          signatures as the accessors in the generated ``mmio`` module.
+          The write function is ``None`` for read-only registers.
+        """
+        r = self.descr.get(name)
+        if r is None:
+            return None, None
+        if r.num == 1:
+            read = lambda: self.read(name)
+            write = lambda val: self.write(name, val)
+        else:
+            read = lambda num: self.read(name, num)
+            write = lambda val, num: self.write(name, val, num)
+        if r.rwperm == "read-only":
+            write = None
+        return read, write
+
+    def module(self):
+        """
+        :return: Object with ``read_*`` and ``write_*`` attributes that
+          can stand in for the ``mmio`` module.
+        """
+        m = SimpleNamespace()
+        for name in self.descr:
+            read, write = self.lookup(name)
+            setattr(m, f"read_{name}", read)
+            if write is not None:
+                setattr(m, f"write_{name}", write)
+        return m
+
+    def import_board(self, *names):
+        """
+        Import scripts from ``linux`` with this register file as their
+        ``mmio`` module. See ``import_board``.
+
+        :return: List of the imported modules.
+        """
+        mmio = ModuleType("mmio")
+        mmio.__dict__.update(vars(self.module()))
+        mmio.regs = self
+        return import_board(mmio, *names)
+
+def import_board(mmio, *names):
+    """
+    Import scripts from ``linux`` with ``mmio`` as their ``mmio`` module.
+
+    ``sys.modules`` and ``sys.path`` are restored afterwards, so the
+    modules are private to ``mmio`` and do not replace modules that were
+    already imported.
+
+    :param mmio: Module object, e.g. from ``FakeRegisters`` or a module
+      generated by ``csr2mp.py``.
+    :param names: Module names, in import order. Modules that import
+      each other (e.g. ``comm`` and ``worker``) must all be listed.
+    :return: List of the imported modules.
+    """
+    saved = {n: sys.modules.get(n) for n in ("mmio",) + names}
+    path = list(sys.path)
+    try:
+        sys.modules["mmio"] = mmio
+        for n in names:
+            sys.modules.pop(n, None)
+        sys.path.insert(0, os.path.join(UPSILON_ROOT, "linux"))
+        return [importlib.import_module(n) for n in names]
+    finally:
+        sys.path[:] = path
+        for n, m in saved.items():
+            if m is None:
+                sys.modules.pop(n, None)
+            else:
+                sys.modules[n] = m
@@ -0,0 +1,152 @@
+"""
+Copyright 2023 (C) Peter McGoron
+
+This file is a part of Upsilon, a free and open source software project.
+For license terms, refer to the files in `doc/copying` in the Upsilon
+source distribution.
+"""
+
+"""
+Offline analysis of MMIO traces saved by ``trace_dump`` in ``linux/comm.py``.
+
+    python3 mmio_trace.py trace.bin
+
+prints the largest timing gaps between register accesses, redundant writes
+(writes of the value a register already holds), and the result of replaying
+the trace against the fake register file.
+"""
+
+import sys
+import struct
+import numpy as np
+
+TRACE_DTYPE = np.dtype([("fun", "<u2"), ("num", "u1"), ("val", "<u8"), ("t", "<u4")])
+NONUM = 255
+
+class Trace:
+    def __init__(self, names, records, period):
+        """
+        :param names: Accessor names, indexed by ``records["fun"]``.
+        :param records: Structured array with ``TRACE_DTYPE``.
+        :param period: Period of the board's ``time.ticks_us``.
+        """
+        self.names = names
+        self.records = records
+        self.period = period
+
+    @classmethod
+    def load(cls, fname):
+        with open(fname, "rb") as f:
+            b = f.read()
+        if b[:4] != b"UPTR":
+            raise Exception(f"{fname} is not a trace file")
+        version, rec, count, period, nnames = struct.unpack_from("<HIIIH", b, 4)
+        if version != 1 or rec != TRACE_DTYPE.itemsize:
+            raise Exception(f"unsupported trace version {version}")
+        i = 4 + struct.calcsize("<HIIIH")
+        names = []
+        for _ in range(nnames):
+            l = b[i]
+            names.append(b[i+1:i+1+l].decode())
+            i += 1 + l
+        return cls(names, np.frombuffer(b, dtype=TRACE_DTYPE, count=count, offset=i), period)
+
+    def access(self, i):
+        """
+        :return: Tuple of the operation type and register name of
+          accessor ``i``.
+        """
+        optype, name = self.names[i].split("_", 1)
+        return optype, name
+
+    def deltas(self):
+        """
+        :return: Time in microseconds between each record and the
+          previous one. The first element is zero.
+        """
+        t = self.records["t"].astype(np.int64)
+        d = np.diff(t, prepend=t[:1]) % self.period
+        return d
+
+    def gaps(self, n=10):
+        """
+        :return: List of the ``n`` largest gaps as tuples of the gap in
+          microseconds, the record index, and the accessor names before
+          and after the gap.
+        """
+        d = self.deltas()
+        idx = np.argsort(d)[::-1][:n]
+        fun = self.records["fun"]
+        return [(int(d[i]), int(i), self.names[fun[i-1]] if i > 0 else None,
+                 self.names[fun[i]]) for i in idx if d[i] > 0]
+
+    def redundant_writes(self):
+        """
+        Find writes of the value that the same register already holds
+        from a previous write.
+
+        :return: Dictionary from accessor name to the number of
+          redundant writes.
+        """
+        last = {}
+        counts = {}
+        for fun, num, val, _ in self.records.tolist():
+            optype, name = self.access(fun)
+            if optype != "write":
+                continue
+            if last.get((name, num)) == val:
+                counts[self.names[fun]] = counts.get(self.names[fun], 0) + 1
+            last[(name, num)] = val
+        return counts
+
+    def replay(self, regs):
+        """
+        Replay the trace against a register file.
+
+        :param regs: Object with a ``lookup`` method, such as
+          ``fake_mmio.FakeRegisters``.
+        :return: Dictionary from accessor name to the number of reads
+          whose value differs from the recorded value.
+        """
+        accessors = {}
+        mismatches = {}
+        for fun, num, val, _ in self.records.tolist():
+            if fun not in accessors:
+                optype, name = self.access(fun)
+                read, write = regs.lookup(name)
+                accessors[fun] = (optype, read, write)
+            optype, read, write = accessors[fun]
+            args = () if num == NONUM else (num,)
+            if optype == "write":
+                write(val, *args)
+            elif read(*args) & 0xFFFFFFFFFFFFFFFF != val:
+                mismatches[self.names[fun]] = mismatches.get(self.names[fun], 0) + 1
+        return mismatches
+
+def report(trace, out=sys.stdout):
+    d = trace.deltas()
+    print(f"{len(trace.records)} records over {int(d.sum())} us", file=out)
+
+    print("\nlargest gaps (us, record, before, after):", file=out)
+    for g in trace.gaps():
+        print(*g, file=out)
+
+    print("\ntime before each accessor (calls, total us):", file=out)
+    fun = trace.records["fun"]
+    calls = np.bincount(fun, minlength=len(trace.names))
+    total = np.bincount(fun, weights=d, minlength=len(trace.names))
+    for i in np.argsort(total)[::-1]:
+        if calls[i] != 0:
+            print(trace.names[i], calls[i], int(total[i]), file=out)
+
+    print("\nredundant writes:", file=out)
+    for name, n in sorted(trace.redundant_writes().items(), key=lambda x: -x[1]):
+        print(name, n, file=out)
+
+    from fake_mmio import FakeRegisters
+    print("\nreads differing from the fake register file:", file=out)
+    for name, n in sorted(trace.replay(FakeRegisters()).items(), key=lambda x: -x[1]):
+        print(name, n, file=out)
+
+if __name__ == "__main__":
+    report(Trace.load(sys.argv[1]))
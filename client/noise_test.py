@@ -6,76 +6,104 @@ For license terms, refer to the files in `doc/copying` in the Upsilon
 source distribution.
 """
 
-from pssh.clients import SSHClient # require parallel-ssh
-import numpy as np
-import matplotlib.pyplot as plt
-import pandas as pd
 import sys
 
-def sign_extend(value, bits):
+def main(argv, plot=True):
     """
-    Interpret ``value`` as a twos-complement integer of ``bits`` length.
+    Run the noise ramp on the board.
 
-    :param value: Twos-complement integer with finite bit width.
-    :param bits: Bit length of ``value``.
-    :return: ``value`` converted to a Python integer.
+    :param argv: ``[name]`` or ``[name, sem_target]``. Results are
+      stored in the run directory ``name`` and in ``name.csv``.
+    :param plot: Plot the mean ADC value against the DAC value.
     """
+    # Heavy dependencies are imported here so that importing this module
+    # (e.g. from upsilon.py) is fast.
+    from pssh.clients import SSHClient # require parallel-ssh
+    import numpy as np
+    import pandas as pd
+    from storage import RunWriter, run_metadata
 
-    # Check the sign bit of the integer.
-    is_signed = (value >> (bits - 1)) & 1 == 1
-    # If not signed, just return the integer.
-    if not is_signed:
-        return value
-    # Otherwise,
-    # 1. Do an explicit twos-complement negation
-    # 2. Mask all the non-sign bits
-    # This returns the positive value as a standard Python integer.
-    # Then the function negates the positive integer to get the negative
-    # one back.
-    return -((~value + 1) & ((1 << (bits - 1)) - 1))
+    ###################
+    # Boilerplate
+    ###################
 
-###################
-# Boilerplate
-###################
+    # Start a SSH connection to the server.
+    print('connecting')
+    client = SSHClient('192.168.2.50', user='root', pkey='~/.ssh/upsilon_key')
+    # Upload the script.
+    print('connected')
+    client.scp_send('../linux/noise_test.py', '/root/noise_test.py')
+    # Run the script. The board sends one summary line per DAC step.
+    # If a standard error target is given, each step is sampled until the
+    # standard error of the mean is below the target.
+    if len(argv) > 1:
+        out = client.run_command(f'micropython noise_test.py adaptive {argv[1]}')
+    else:
+        out = client.run_command('micropython noise_test.py reduce')
 
-# Start a SSH connection to the server.
-print('connecting')
-client = SSHClient('192.168.2.50', user='root', pkey='~/.ssh/upsilon_key')
-# Upload the script.
-print('connected')
-client.scp_send('../linux/noise_test.py', '/root/noise_test.py')
-# Run the script.
-out = client.run_command('micropython noise_test.py')
+    ################
+    # Script Handler
+    ################
+    # The ramp script outputs one line per DAC setting:
+    #
+    #     S dac count sum sumsq
+    #
+    # where the last three values are the number of ADC samples, their sum
+    # and the sum of their squares. If the script is run in raw mode, it
+    # instead outputs every sample as a line with the DAC setting and the
+    # ADC value. Raw samples from a decimated reduction run start with "R"
+    # and are ignored.
+    #
+    # This script averages the ADC values by DAC value, and plots it.
 
-################
-# Script Handler
-################
-"""
-The ramp script outputs a list of lines, each with two values separated by one
-space. The first value is the DAC setting, the second value is the ADC setting.
-This script gets all of those values, averages them by DAC value, and plots
-it.
-"""
+    # Summaries are stored as they arrive in the run directory argv[0].
+    store = RunWriter(argv[0],
+                      {"dac": "i4", "n": "i4", "sum": "i8", "sumsq": "i8"},
+                      run_metadata(dac_range=[-300, 300], dac=0, adc=0,
+                                   sem_target=argv[1] if len(argv) > 1 else None),
+                      chunk_rows=64)
 
-current_dac = None
-current_adc = []
-x_ax = []
-y_ax = []
-for line in out.stdout:
-    l = line.split(' ')
-    if l[0] != current_dac:
-        if current_dac is not None:
-            m = np.mean(current_adc)
-            sdev = np.std(current_adc)
-            print(current_dac, m, sdev)
-            x_ax.append(current_dac)
+    current_dac = None
+    current_adc = []
+    x_ax = []
+    y_ax = []
+    n_ax = []
+    for line in out.stdout:
+        l = line.split(' ')
+        if l[0] == 'R':
+            continue
+        if l[0] == 'S':
+            dac = int(l[1])
+            n, s, s2 = int(l[2]), int(l[3]), int(l[4])
+            m = s / n
+            sdev = np.sqrt(max(s2 / n - m*m, 0))
+            print(dac, m, sdev, n)
+            x_ax.append(dac)
             y_ax.append(m)
-        current_adc = [sign_extend(int(l[1]), 18)]
-        current_dac = l[0]
-    else:
-        current_adc.append(sign_extend(int(l[1]),18))
+            n_ax.append(n)
+            store.append(dac=dac, n=n, sum=s, sumsq=s2)
+            continue
+
+        if l[0] != current_dac:
+            if current_dac is not None:
+                m = np.mean(current_adc)
+                sdev = np.std(current_adc)
+                print(current_dac, m, sdev)
+                x_ax.append(current_dac)
+                y_ax.append(m)
+                n_ax.append(len(current_adc))
+            current_adc = [int(l[1])]
+            current_dac = l[0]
+        else:
+            current_adc.append(int(l[1]))
+
+    store.close()
+    df = pd.DataFrame({"x": x_ax, "y": y_ax, "n": n_ax})
+    df.to_csv(f"{argv[0]}.csv")
+    if plot:
+        import matplotlib.pyplot as plt
+        plt.plot(df.x, df.y)
+        plt.show()
 
-df = pd.DataFrame({"x": x_ax, "y": y_ax})
-df.to_csv(f"{sys.argv[1]}.csv")
-plt.plot(df.x, df.y)
-plt.show()
+if __name__ == "__main__":
+    main(sys.argv[1:])
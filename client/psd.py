@@ -0,0 +1,171 @@
+"""
+Copyright 2023 (C) Peter McGoron
+
+This file is a part of Upsilon, a free and open source software project.
+For license terms, refer to the files in `doc/copying` in the Upsilon
+source distribution.
+"""
+
+"""
+Streaming power spectral density estimation.
+
+Long ADC captures are processed chunk by chunk with Welch's method. Only
+the last partial segment of each channel is kept between chunks, so
+memory use does not depend on the length of the capture. The result is
+the same as ``scipy.signal.welch`` with ``scaling="density"`` on the whole
+capture.
+"""
+
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+
+class WelchPSD:
+    def __init__(self, fs, nperseg=1024, noverlap=None, channels=1,
+                 window="hann", detrend=True, workers=1, max_segments=256):
+        """
+        :param fs: Sample rate in Hz.
+        :param nperseg: Length of each segment.
+        :param noverlap: Number of samples segments overlap. Defaults
+          to ``nperseg // 2``.
+        :param channels: Number of channels.
+        :param window: ``"hann"``, ``"boxcar"``, or an array of length
+          ``nperseg``.
+        :param detrend: Subtract the mean of each segment.
+        :param workers: Number of threads that process channels in
+          parallel. NumPy releases the GIL while computing FFTs.
+        :param max_segments: Maximum number of segments transformed at
+          once. This bounds the memory used by a large chunk.
+        """
+        if noverlap is None:
+            noverlap = nperseg // 2
+        if not 0 <= noverlap < nperseg:
+            raise Exception(f"noverlap {noverlap} must be in [0, {nperseg})")
+        self.fs = fs
+        self.nperseg = nperseg
+        self.step = nperseg - noverlap
+        self.channels = channels
+        self.detrend = detrend
+        self.max_segments = max_segments
+
+        if isinstance(window, str):
+            if window == "hann":
+                # Periodic Hann window, as used by scipy.signal.welch.
+                window = 0.5 - 0.5*np.cos(2*np.pi*np.arange(nperseg)/nperseg)
+            elif window == "boxcar":
+                window = np.ones(nperseg)
+            else:
+                raise Exception(f"unknown window {window}")
+        self.window = np.asarray(window, dtype=np.float64)
+        if self.window.shape != (nperseg,):
+            raise Exception("window must have length nperseg")
+
+        self.tail = np.empty((channels, 0), dtype=np.float64)
+        self.acc = np.zeros((channels, nperseg//2 + 1), dtype=np.float64)
+        self.nseg = 0
+        self.pool = ThreadPoolExecutor(workers) if workers > 1 else None
+        self.workers = workers
+
+    def _segments(self, buf, lo, hi):
+        """ Sum of squared FFT magnitudes of segments ``lo`` to ``hi``. """
+        segs = np.lib.stride_tricks.sliding_window_view(buf, self.nperseg, axis=-1)
+        segs = segs[:, lo*self.step:(hi - 1)*self.step + 1:self.step, :]
+        if self.detrend:
+            segs = segs - segs.mean(axis=-1, keepdims=True)
+        spec = np.fft.rfft(segs * self.window, axis=-1)
+        return (spec.real**2 + spec.imag**2).sum(axis=1)
+
+    def _process(self, buf, nseg):
+        for lo in range(0, nseg, self.max_segments):
+            hi = min(lo + self.max_segments, nseg)
+            if self.pool is None:
+                self.acc += self._segments(buf, lo, hi)
+                continue
+            groups = np.array_split(np.arange(self.channels), self.workers)
+            groups = [g for g in groups if len(g) > 0]
+            res = self.pool.map(lambda g: self._segments(buf[g], lo, hi), groups)
+            for g, r in zip(groups, res):
+                self.acc[g] += r
+
+    def feed(self, chunk):
+        """
+        Add samples to the estimate.
+
+        :param chunk: Array of shape ``(channels, n)``. A one dimensional
+          array is accepted when there is one channel.
+        """
+        chunk = np.asarray(chunk, dtype=np.float64)
+        if chunk.ndim == 1:
+            chunk = chunk[np.newaxis, :]
+        if chunk.shape[0] != self.channels:
+            raise Exception(f"expected {self.channels} channels, got {chunk.shape[0]}")
+
+        buf = np.concatenate((self.tail, chunk), axis=1)
+        n = buf.shape[1]
+        if n < self.nperseg:
+            self.tail = buf
+            return
+        nseg = (n - self.nperseg) // self.step + 1
+        self._process(buf, nseg)
+        self.nseg += nseg
+        self.tail = buf[:, nseg*self.step:].copy()
+
+    def result(self):
+        """
+        :return: Tuple of the frequencies (Hz) and the one-sided PSD of
+          shape ``(channels, nperseg // 2 + 1)`` in units squared per Hz.
+        :raises Exception: When no complete segment has been fed.
+        """
+        if self.nseg == 0:
+            raise Exception("not enough samples for one segment")
+        psd = self.acc / (self.nseg * self.fs * (self.window**2).sum())
+        if self.nperseg % 2 == 0:
+            psd[:, 1:-1] *= 2
+        else:
+            psd[:, 1:] *= 2
+        return np.fft.rfftfreq(self.nperseg, 1/self.fs), psd
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.shutdown()
+
+def iter_chunks(stream, channels, chunk_samples=65536):
+    """
+    Read interleaved samples forwarded by ``linux/ram_shim.py``.
+
+    :param stream: Binary stream.
+    :param channels: Number of interleaved channels.
+    :param chunk_samples: Samples per channel in each chunk.
+    :return: Iterator of arrays of shape ``(channels, n)``.
+    """
+    nbytes = 4*channels*chunk_samples
+    rest = b""
+    while True:
+        b = stream.read(nbytes - len(rest))
+        if not b:
+            break
+        b = rest + b
+        n = len(b) - len(b) % (4*channels)
+        rest = b[n:]
+        if n > 0:
+            yield np.frombuffer(b[:n], dtype="<i4").reshape(-1, channels).T
+
+def welch_stream(chunks, fs, **kwargs):
+    """
+    Compute a Welch PSD estimate from an iterable of chunks.
+
+    :param chunks: Iterable of arrays accepted by ``WelchPSD.feed``.
+    :param fs: Sample rate in Hz.
+    :param kwargs: Passed to ``WelchPSD``.
+    :return: Same as ``WelchPSD.result``.
+    """
+    est = None
+    for c in chunks:
+        if est is None:
+            c = np.asarray(c)
+            kwargs.setdefault("channels", 1 if c.ndim == 1 else c.shape[0])
+            est = WelchPSD(fs, **kwargs)
+        est.feed(c)
+    if est is None:
+        raise Exception("no data")
+    est.close()
+    return est.result()
@@ -0,0 +1,155 @@
+"""
+Copyright 2023 (C) Peter McGoron
+
+This file is a part of Upsilon, a free and open source software project.
+For license terms, refer to the files in `doc/copying` in the Upsilon
+source distribution.
+"""
+
+"""
+Client for the batched register operation server (``linux/rpc_server.py``).
+
+Example:
+
+    rpc = connect_rpc()
+    b = Batch()
+    b.write("adc_arm", 1, 0)
+    b.wait("adc_finished", 1, 0)
+    val = b.read("adc_recv_buf", 0)
+    b.write("adc_arm", 0, 0)
+    res = rpc.execute(b)
+    print(res[val])
+"""
+
+import os
+import struct
+import threading
+from util import import_upsilon, ssh_popen
+
+mmio_descr = import_upsilon("gateware", "mmio_descr")
+proto = import_upsilon("linux", "rpc_server")
+
+class RPCError(Exception):
+    """
+    A batch stopped early.
+
+    :ivar status: ``STATUS_ERROR`` or ``STATUS_TIMEOUT`` of
+      ``rpc_server.py``.
+    :ivar index: Index of the operation that failed.
+    :ivar results: Results of the operations before it.
+    """
+    def __init__(self, status, index, name, results):
+        kind = "timeout" if status == proto.STATUS_TIMEOUT else "error"
+        super().__init__(f"RPC {kind} at operation {index} ({name}), results {results}")
+        self.status = status
+        self.index = index
+        self.results = results
+
+class Batch:
+    """
+    List of register operations that are executed in one round trip.
+    Registers are named as in ``mmio_descr.registers``.
+    """
+    def __init__(self):
+        self.ops = []
+
+    def _add(self, op, name, num, val=0, timeout_ms=0):
+        self.ops.append((op, name, proto.NONUM if num is None else num,
+                         proto.to_i64(val), timeout_ms))
+        return len(self.ops) - 1
+
+    def read(self, name, num=None):
+        """
+        :return: Index of the result of this read.
+        """
+        return self._add(proto.OP_READ, name, num)
+
+    def write(self, name, val, num=None):
+        return self._add(proto.OP_WRITE, name, num, val)
+
+    def wait(self, name, val, num=None, timeout_ms=1000):
+        """
+        Read the register until it equals ``val``. The batch stops if
+        this takes longer than ``timeout_ms``.
+        """
+        return self._add(proto.OP_WAIT, name, num, val, timeout_ms)
+
+class RPCClient:
+    def __init__(self, wfile, rfile, registers=None):
+        """
+        :param wfile: Binary stream to the server.
+        :param rfile: Binary stream from the server.
+        :param registers: List of ``mmio_descr`` ``Descr``s. Defaults to
+          ``mmio_descr.registers``.
+        """
+        if registers is None:
+            registers = mmio_descr.registers
+        self.w = wfile
+        self.r = rfile
+        self.index = {r.name: i for i, r in enumerate(registers)}
+
+        b = bytearray(struct.pack("<H", len(registers)))
+        for r in registers:
+            name = r.name.encode()
+            b += struct.pack("<B", len(name)) + name
+        self.w.write(b)
+        self.w.flush()
+        self.available = struct.unpack("<H", self._readn(2))[0]
+
+    def _readn(self, n):
+        b = proto.readn(self.r, n)
+        if b is None:
+            raise Exception("RPC server closed connection")
+        return b
+
+    def execute(self, batch):
+        """
+        Execute a batch.
+
+        :return: List with one result per operation.
+        :raises RPCError: When an operation fails or a wait times out.
+        """
+        b = bytearray(struct.pack("<H", len(batch.ops)))
+        for op, name, num, val, timeout in batch.ops:
+            b += struct.pack(proto.OP_FMT, op, self.index[name], num, val, timeout)
+        self.w.write(b)
+        self.w.flush()
+
+        status, n = struct.unpack(proto.REPLY_FMT,
+                                  self._readn(struct.calcsize(proto.REPLY_FMT)))
+        res = list(struct.unpack(f"<{n}q", self._readn(8*n)))
+        if status != proto.STATUS_OK:
+            raise RPCError(status, n, batch.ops[n][1], res)
+        return res
+
+    def close(self):
+        self.w.write(struct.pack("<H", 0))
+        self.w.flush()
+
+def connect_rpc():
+    """ Start the RPC server on the board. """
+    p = ssh_popen("rpc_server.py")
+    return RPCClient(p.stdin, p.stdout)
+
+def local_server(regs=None):
+    """
+    Run the RPC server in a thread against a fake register file.
+
+    :param regs: ``fake_mmio.FakeRegisters`` instance. A new one is made
+      if ``None``.
+    :return: Tuple of the ``RPCClient`` and the register file.
+    """
+    if regs is None:
+        from fake_mmio import FakeRegisters
+        regs = FakeRegisters()
+    to_srv_r, to_srv_w = os.pipe()
+    from_srv_r, from_srv_w = os.pipe()
+    srv_in = os.fdopen(to_srv_r, "rb")
+    srv_out = os.fdopen(from_srv_w, "wb")
+
+    def run():
+        with srv_in, srv_out:
+            proto.serve(srv_in, srv_out, regs.lookup)
+    threading.Thread(target=run, daemon=True).start()
+
+    return RPCClient(os.fdopen(to_srv_w, "wb"), os.fdopen(from_srv_r, "rb")), regs
@@ -0,0 +1,288 @@
+"""
+Copyright 2023 (C) Peter McGoron
+
+This file is a part of Upsilon, a free and open source software project.
+For license terms, refer to the files in `doc/copying` in the Upsilon
+source distribution.
+"""
+
+"""
+Experiment scheduler.
+
+Jobs are queued in a directory and run back to back by
+``linux/worker.py``, which stays running on the board between jobs. The
+next job is sent before the current one finishes, so the board does not
+wait for the client between jobs. The results of each job are stored as a
+run (see ``storage.py``) in a subdirectory of the queue directory.
+
+    s = Scheduler("night1")
+    s.submit("noise", lo=-300, hi=300, sem_target=2)
+    s.submit("control_loop", setpt=10000, P="0.0006", I="0.01",
+             samples=1000, stop=True)
+    s.run()
+
+The queue is saved in ``queue.json``. Jobs that did not finish (e.g.
+because the connection was lost) are run again by the next ``run``.
+Failed jobs are only run again with ``retry=True``.
+"""
+
+import os
+import json
+import shutil
+import threading
+from util import ssh_popen, string_to_fixed_point
+
+# Parameters given as decimal strings or floats that are sent as fixed
+# point integers, with their number of fractional bits.
+FIXED_POINT_PARAMS = {
+    "control_loop": {"P": 43, "I": 43},
+}
+
+def connect_worker(**kwargs):
+    """
+    Start the worker on the board.
+
+    :param kwargs: Passed to ``ssh_popen``.
+    :return: Tuple of the binary streams to and from the worker.
+    """
+    p = ssh_popen("worker.py", **kwargs)
+    return p.stdin, p.stdout
+
+def local_worker(regs=None):
+    """
+    Run the worker in a thread against a fake register file.
+
+    :param regs: ``fake_mmio.FakeRegisters`` instance. A new one is made
+      if ``None``.
+    :return: Tuple of the streams to and from the worker, and the
+      register file.
+    """
+    if regs is None:
+        from fake_mmio import FakeRegisters
+        regs = FakeRegisters()
+    comm, worker = regs.import_board("comm", "worker")
+
+    to_w_r, to_w_w = os.pipe()
+    from_w_r, from_w_w = os.pipe()
+    w_in = os.fdopen(to_w_r, "r")
+    w_out = os.fdopen(from_w_w, "w")
+
+    def run():
+        with w_in, w_out:
+            worker.serve(w_in, w_out)
+    threading.Thread(target=run, daemon=True).start()
+
+    return os.fdopen(to_w_w, "wb"), os.fdopen(from_w_r, "rb"), regs
+
+class WorkerConnection:
+    """
+    Connection to a worker that stays open between jobs.
+
+        w = WorkerConnection()
+        rows = w.call("noise", lo=-10, hi=10)
+        w.close()
+    """
+    def __init__(self, conn=None):
+        """
+        :param conn: Tuple of binary streams to and from a worker.
+          Defaults to ``connect_worker()``.
+        :raises Exception: When the worker does not start.
+        """
+        if conn is None:
+            conn = connect_worker()
+        self.w, self.r = conn[0], conn[1]
+        self.next_id = 1
+        hello = self.recv()
+        if not hello.get("ready"):
+            raise Exception(f"unexpected message from worker: {hello}")
+        self.jobs = hello["jobs"]
+
+    def recv(self):
+        """ :raises Exception: When the worker exited. """
+        line = self.r.readline()
+        if not line:
+            raise Exception("worker exited")
+        return json.loads(line)
+
+    def send(self, msg):
+        self.w.write(json.dumps(msg).encode() + b"\n")
+        self.w.flush()
+
+    def call(self, kind, **params):
+        """
+        Run one job and wait for it to finish.
+
+        :return: Dictionary from column name to list of values.
+        :raises Exception: When the job fails.
+        """
+        jid = self.next_id
+        self.next_id += 1
+        self.send({"id": jid, "type": kind, "params": params})
+        cols = {}
+        while True:
+            msg = self.recv()
+            if msg["id"] != jid:
+                raise Exception(f"unexpected message from worker: {msg}")
+            if "columns" in msg:
+                cols = {k: [] for k in msg["columns"]}
+            elif "rows" in msg:
+                for k, v in msg["rows"].items():
+                    cols[k] += v
+            elif msg.get("done"):
+                if msg["error"] is not None:
+                    raise Exception(f"{kind} failed: {msg['error']}")
+                return cols
+
+    def close(self):
+        """ Stop the worker. """
+        self.send({"type": "quit"})
+        self.w.close()
+
+class Scheduler:
+    def __init__(self, directory):
+        """
+        :param directory: Queue directory. It is created if it does not
+          exist, and an existing queue in it is loaded.
+        """
+        self.directory = directory
+        self.qfile = os.path.join(directory, "queue.json")
+        os.makedirs(directory, exist_ok=True)
+        self.jobs = []
+        if os.path.exists(self.qfile):
+            with open(self.qfile) as f:
+                self.jobs = json.load(f)
+
+    def _save(self):
+        with open(self.qfile + ".tmp", "w") as f:
+            json.dump(self.jobs, f, indent=1)
+        os.replace(self.qfile + ".tmp", self.qfile)
+
+    def submit(self, kind, name=None, **params):
+        """
+        Add a job to the end of the queue.
+
+        :param kind: Job type supported by ``linux/worker.py``.
+        :param name: Name of the run directory in the queue directory.
+          Defaults to the job number and type.
+        :param params: Job parameters. Values must be JSON serializable.
+        :return: Job id.
+        """
+        for k, frac in FIXED_POINT_PARAMS.get(kind, {}).items():
+            if isinstance(params.get(k), str):
+                params[k] = string_to_fixed_point(params[k], frac)
+            elif isinstance(params.get(k), float):
+                params[k] = round(params[k] * (1 << frac))
+        jid = max((j["id"] for j in self.jobs), default=0) + 1
+        if name is None:
+            name = f"{jid:04d}_{kind}"
+        if name in ("", ".", "..") or os.path.basename(name) != name \
+                or (os.altsep is not None and os.altsep in name):
+            raise Exception(f"job name {name!r} is not a plain directory name")
+        if any(j["name"] == name for j in self.jobs):
+            raise Exception(f"job {name} already exists")
+        self.jobs.append({"id": jid, "type": kind, "name": name, "params": params})
+        self._save()
+        return jid
+
+    def path(self, job):
+        return os.path.join(self.directory, job["name"])
+
+    def _meta(self, job):
+        """
+        :return: Metadata of the run of ``job``, or ``None`` if there is
+          none.
+        """
+        try:
+            with open(os.path.join(self.path(job), "meta.json")) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def _clear(self, job):
+        """
+        Remove the results of an interrupted or failed run of ``job``.
+
+        :raises Exception: When the run directory exists but does not
+          hold a run of this job.
+        """
+        path = self.path(job)
+        if not os.path.exists(path):
+            return
+        meta = (self._meta(job) or {}).get("metadata", {})
+        if meta.get("job_id") != job["id"] or meta.get("job") != job["type"]:
+            raise Exception(f"{path} exists and is not a run of job {job['id']}")
+        shutil.rmtree(path)
+
+    def status(self, job):
+        """
+        :return: ``"done"``, ``"failed"`` or ``"pending"``.
+        """
+        meta = self._meta(job)
+        if meta is None:
+            return "pending"
+        if meta.get("complete"):
+            return "done"
+        if "error" in meta:
+            return "failed"
+        return "pending"
+
+    def pending(self, retry=False):
+        """ :return: Jobs that will be run by ``run``. """
+        want = ("pending", "failed") if retry else ("pending",)
+        return [j for j in self.jobs if self.status(j) in want]
+
+    def run(self, conn=None, depth=2, retry=False, log=print):
+        """
+        Run all pending jobs.
+
+        :param conn: Tuple of binary streams to and from a worker.
+          Defaults to ``connect_worker()``.
+        :param depth: Number of jobs sent to the worker ahead of the
+          results.
+        :param retry: Also run failed jobs again.
+        :param log: Function called with a message when a job finishes.
+        :return: Number of jobs that failed.
+        :raises Exception: When the worker exits early, or when the run
+          directory of a pending job holds something other than a run of
+          that job.
+        """
+        from storage import RunWriter, run_metadata
+
+        todo = self.pending(retry)
+        for job in todo:
+            self._clear(job)
+        worker = WorkerConnection(conn)
+
+        byid = {j["id"]: j for j in todo}
+        writers = {}
+        sent = 0
+        finished = 0
+        failed = 0
+        while finished < len(todo):
+            while sent < len(todo) and sent - finished < depth:
+                job = todo[sent]
+                worker.send({"id": job["id"], "type": job["type"], "params": job["params"]})
+                sent += 1
+
+            msg = worker.recv()
+            job = byid[msg["id"]]
+            if "columns" in msg:
+                meta = run_metadata(job=job["type"], job_id=job["id"], **job["params"])
+                writers[job["id"]] = RunWriter(self.path(job), msg["columns"], meta)
+            elif "rows" in msg:
+                writers[job["id"]].extend(**msg["rows"])
+            elif msg.get("done"):
+                wr = writers.pop(job["id"], None)
+                if wr is None:
+                    meta = run_metadata(job=job["type"], job_id=job["id"], **job["params"])
+                    wr = RunWriter(self.path(job), {}, meta)
+                wr.close(msg["error"])
+                finished += 1
+                if msg["error"] is None:
+                    log(f"{job['name']}: done ({wr.rows} rows)")
+                else:
+                    failed += 1
+                    log(f"{job['name']}: failed: {msg['error']}")
+
+        worker.close()
+        return failed
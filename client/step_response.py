@@ -0,0 +1,37 @@
+"""
+Copyright 2023 (C) Peter McGoron
+
+This file is a part of Upsilon, a free and open source software project.
+For license terms, refer to the files in `doc/copying` in the Upsilon
+source distribution.
+"""
+
+from util import ssh_popen, decode_capture
+
+def step_response(setpt, length=1024, decimate=1, **kwargs):
+    """
+    Change the setpoint of the running control loop and record the
+    response with the capture buffer.
+
+    :param setpt: New setpoint in ADC units.
+    :param length: Number of samples, at most 1024.
+    :param decimate: Loop iterations between samples.
+    :param kwargs: Passed to ``ssh_popen``.
+    :return: Same as ``util.decode_capture``.
+    """
+    p = ssh_popen("step_response.py", setpt, length, decimate, **kwargs)
+    data, _ = p.communicate()
+    if p.returncode != 0:
+        raise Exception(f"step_response.py exited with {p.returncode}")
+    if len(data) != 8*length:
+        raise Exception(f"expected {8*length} bytes, got {len(data)}")
+    return decode_capture(data)
+
+def main(name, setpt, length=1024, decimate=1):
+    """ Record a step response and store it in the run directory ``name``. """
+    from storage import RunWriter, run_metadata
+
+    measured, pos = step_response(setpt, length, decimate)
+    meta = run_metadata(setpt=setpt, decimate=decimate)
+    with RunWriter(name, {"measured": "i4", "pos": "i4"}, meta) as w:
+        w.extend(measured=measured, pos=pos)
@@ -0,0 +1,191 @@
+"""
+Copyright 2023 (C) Peter McGoron
+
+This file is a part of Upsilon, a free and open source software project.
+For license terms, refer to the files in `doc/copying` in the Upsilon
+source distribution.
+"""
+
+"""
+Chunked columnar storage for measurement results.
+
+A run is a directory containing ``meta.json`` and numbered ``.npz``
+chunks. Rows are appended as they arrive and written out every
+``chunk_rows`` rows, so a crash loses at most one chunk. Each chunk is
+written to a temporary file and renamed, so a chunk is either complete or
+missing.
+
+    with RunWriter("run1", {"dac": "i4", "adc": "i4"},
+                   run_metadata(dac_range=[-300, 300])) as w:
+        w.append(dac=1, adc=2)
+    cols, meta = load("run1")
+
+``meta["complete"]`` is only set when the run is closed normally. If the
+``with`` block raises, the rows written so far are kept and the exception
+is stored in ``meta["error"]``.
+"""
+
+import os
+import sys
+import json
+import time
+import glob
+import hashlib
+import numpy as np
+from util import UPSILON_ROOT
+
+def git_blob_hash(fname):
+    """
+    :return: Hash that ``git hash-object`` would give ``fname``, or
+      ``None`` if the file does not exist.
+    """
+    try:
+        with open(fname, "rb") as f:
+            data = f.read()
+    except FileNotFoundError:
+        return None
+    return hashlib.sha1(b"blob %d\0" % len(data) + data).hexdigest()
+
+def mmio_hash():
+    """
+    :return: Git hash of the generated ``mmio.py``, or ``None`` if it has
+      not been built.
+    """
+    for d in ("boot", "gateware"):
+        h = git_blob_hash(os.path.join(UPSILON_ROOT, d, "mmio.py"))
+        if h is not None:
+            return h
+    return None
+
+def run_metadata(board_ip='192.168.2.50', **extra):
+    """
+    Metadata common to all runs.
+
+    :param extra: Experiment parameters (gains, DAC ranges, etc.). Values
+      must be JSON serializable.
+    """
+    meta = {
+        "board_ip": board_ip,
+        "mmio_hash": mmio_hash(),
+        "script": os.path.basename(sys.argv[0]),
+        "start_time": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+    }
+    meta.update(extra)
+    return meta
+
+class RunWriter:
+    def __init__(self, path, columns, metadata=None, chunk_rows=4096):
+        """
+        :param path: Run directory. It must not already contain a run.
+        :param columns: Dictionary from column name to NumPy dtype.
+        :param metadata: JSON serializable dictionary.
+        :param chunk_rows: Number of rows in each chunk.
+        :raises Exception: When ``path`` already contains a run.
+        """
+        self.path = path
+        self.dtypes = {k: np.dtype(v) for k, v in columns.items()}
+        self.chunk_rows = chunk_rows
+        self.nchunk = 0
+        self.rows = 0
+        self.buf = {k: np.empty(chunk_rows, dtype=v) for k, v in self.dtypes.items()}
+        self.fill = 0
+
+        os.makedirs(path, exist_ok=True)
+        if os.path.exists(os.path.join(path, "meta.json")):
+            raise Exception(f"{path} already contains a run")
+        self.meta = {
+            "columns": {k: v.str for k, v in self.dtypes.items()},
+            "metadata": metadata or {},
+            "complete": False,
+        }
+        self._write_meta()
+
+    def _write_meta(self):
+        tmp = os.path.join(self.path, "meta.json.tmp")
+        with open(tmp, "w") as f:
+            json.dump(self.meta, f, indent=1)
+        os.replace(tmp, os.path.join(self.path, "meta.json"))
+
+    def append(self, **row):
+        """ Append one row. Every column must be given. """
+        for k, b in self.buf.items():
+            b[self.fill] = row[k]
+        self.fill += 1
+        if self.fill == self.chunk_rows:
+            self.flush()
+
+    def extend(self, **cols):
+        """ Append many rows, given as one array per column. """
+        n = len(next(iter(cols.values())))
+        i = 0
+        while i < n:
+            m = min(n - i, self.chunk_rows - self.fill)
+            for k, b in self.buf.items():
+                b[self.fill:self.fill + m] = cols[k][i:i + m]
+            self.fill += m
+            i += m
+            if self.fill == self.chunk_rows:
+                self.flush()
+
+    def flush(self):
+        """ Write buffered rows to a new chunk. """
+        if self.fill == 0:
+            return
+        name = os.path.join(self.path, f"chunk_{self.nchunk:06d}")
+        with open(name + ".tmp", "wb") as f:
+            np.savez(f, **{k: b[:self.fill] for k, b in self.buf.items()})
+        os.replace(name + ".tmp", name + ".npz")
+        self.nchunk += 1
+        self.rows += self.fill
+        self.fill = 0
+
+    def close(self, error=None):
+        """
+        Write the remaining rows and mark the run as complete.
+
+        :param error: If not ``None``, the run is stored as failed with
+          this message instead of being marked complete.
+        """
+        self.flush()
+        if error is None:
+            self.meta["complete"] = True
+        else:
+            self.meta["error"] = error
+        self.meta["rows"] = self.rows
+        self._write_meta()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close(None if exc is None else repr(exc))
+
+def load(path):
+    """
+    Load a run, including an incomplete one.
+
+    :return: Tuple of a dictionary from column name to array and the run
+      metadata.
+    """
+    with open(os.path.join(path, "meta.json")) as f:
+        meta = json.load(f)
+    parts = {k: [] for k in meta["columns"]}
+    for name in sorted(glob.glob(os.path.join(path, "chunk_*.npz"))):
+        with np.load(name) as c:
+            for k in parts:
+                parts[k].append(c[k])
+    cols = {}
+    for k, dt in meta["columns"].items():
+        cols[k] = np.concatenate(parts[k]) if parts[k] else np.empty(0, dtype=dt)
+    return cols, meta
+
+def load_dataframe(path):
+    """
+    :return: Run as a pandas ``DataFrame``. The metadata is stored in
+      ``DataFrame.attrs``.
+    """
+    import pandas as pd
+    cols, meta = load(path)
+    df = pd.DataFrame(cols)
+    df.attrs.update(meta)
+    return df
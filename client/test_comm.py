@@ -0,0 +1,48 @@
+# Copyright 2023 (C) Peter McGoron
+#
+# This file is a part of Upsilon, a free and open source software project.
+# For license terms, refer to the files in `doc/copying` in the Upsilon
+# source distribution.
+#######################################################################
+#
+# Run linux/comm.py against a fake register file.
+
+import math
+import random
+from fake_mmio import FakeRegisters
+
+def board():
+    regs = FakeRegisters()
+    comm, = regs.import_board("comm")
+    return comm, regs
+
+def test_to_fraction():
+    comm, _ = board()
+    assert comm.to_fraction("0.25") == (25, 100)
+    assert comm.to_fraction("-.5") == (-5, 10)
+    assert comm.to_fraction("2") == (2, 1)
+    assert comm.to_fraction("1e-06") == (1, 1000000)
+    assert comm.to_fraction("1.5E2") == (1500, 10)
+    assert comm.to_fraction(3) == (3, 1)
+    assert comm.to_fraction(1.5) == (98304, 65536)
+
+def test_noise_ramp_adaptive(monkeypatch):
+    comm, _ = board()
+    rng = random.Random(1)
+    monkeypatch.setattr(comm, "adc_read", lambda adc: rng.randint(-50, 50))
+    for target in ["2", "0.9", 2, 2.0]:
+        cnt, acc, acc2 = comm.noise_ramp(0, 0, 0, 4, 5000, sem_target=target,
+                                         out=lambda *l: None)
+        for n, s, s2 in zip(cnt, acc, acc2):
+            assert 4 <= n < 5000
+            sem = math.sqrt((n*s2 - s*s) / (n*n*(n - 1)))
+            assert sem < float(target)
+
+def test_noise_ramp_tiny_target(monkeypatch):
+    comm, _ = board()
+    monkeypatch.setattr(comm, "adc_read", lambda adc: 0)
+    # Constant samples have zero standard error, below any positive
+    # target.
+    cnt, _, _ = comm.noise_ramp(0, 0, 0, 2, 100, sem_target="1e-06",
+                                out=lambda *l: None)
+    assert list(cnt) == [4, 4]
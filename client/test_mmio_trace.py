@@ -0,0 +1,119 @@
+# Copyright 2023 (C) Peter McGoron
+#
+# This file is a part of Upsilon, a free and open source software project.
+# For license terms, refer to the files in `doc/copying` in the Upsilon
+# source distribution.
+#######################################################################
+#
+# Generate tracing and profiling mmio modules, record accesses with them,
+# dump the trace with comm.trace_dump and analyze it with mmio_trace.py.
+#
+# The Micropython ticks functions are added to CPython's time module.
+
+import os
+import time
+import pytest
+from util import import_upsilon
+from fake_mmio import FakeRegisters, import_board
+from mmio_trace import Trace, NONUM
+
+csr2mp = import_upsilon("gateware", "csr2mp")
+fake_board = import_upsilon("gateware", "fake_board")
+
+TICKS_PERIOD = 1 << 30
+
+@pytest.fixture(autouse=True)
+def ticks(monkeypatch):
+    monkeypatch.setattr(time, "ticks_us",
+                        lambda: time.perf_counter_ns() // 1000 % TICKS_PERIOD,
+                        raising=False)
+    monkeypatch.setattr(time, "ticks_add",
+                        lambda a, b: (a + b) % TICKS_PERIOD, raising=False)
+    monkeypatch.setattr(time, "ticks_diff",
+                        lambda a, b: (a - b + TICKS_PERIOD//2) % TICKS_PERIOD - TICKS_PERIOD//2,
+                        raising=False)
+
+def board(cls, **kwargs):
+    mmio, _, _ = fake_board.load_mmio(cls, **kwargs)
+    comm, = import_board(mmio, "comm")
+    return mmio, comm
+
+def tracing(trace_len):
+    return board(csr2mp.TracingMicropythonGenerator, trace_len=trace_len)
+
+def dump(comm, tmp_path):
+    fname = os.path.join(tmp_path, "trace.bin")
+    comm.trace_dump(fname)
+    return Trace.load(fname)
+
+def dac_sel_values(trace):
+    assert all(trace.names[f] == "write_dac_sel" for f in trace.records["fun"])
+    return [int(v) for v in trace.records["val"]]
+
+@pytest.mark.parametrize("writes", [0, 3, 4, 6, 9])
+def test_ring(tmp_path, writes):
+    # 4 is an exactly full ring, 6 and 9 have wrapped around.
+    mmio, comm = tracing(4)
+    for i in range(writes):
+        mmio.write_dac_sel(i, 1)
+    t = dump(comm, tmp_path)
+    assert t.period == TICKS_PERIOD
+    assert dac_sel_values(t) == list(range(max(0, writes - 4), writes))
+    assert list(t.records["num"]) == [1]*min(writes, 4)
+    assert (t.deltas() >= 0).all()
+
+    comm.trace_reset()
+    assert len(dump(comm, tmp_path).records) == 0
+
+def test_redundant_writes(tmp_path):
+    mmio, comm = tracing(64)
+    for v in [1, 1, 2, 2, 2, 1]:
+        mmio.write_dac_sel(v, 0)
+    # A different DAC does not share the value of DAC 0.
+    mmio.write_dac_sel(1, 1)
+    mmio.write_cl_delay_in(5)
+    mmio.write_cl_delay_in(5)
+    mmio.read_cl_delay_in()
+    t = dump(comm, tmp_path)
+    assert t.redundant_writes() == {"write_dac_sel": 3, "write_cl_delay_in": 1}
+
+def test_replay(tmp_path):
+    mmio, comm = tracing(64)
+    mmio.write_cl_setpt_in(-3)
+    assert mmio.read_cl_setpt_in() == -3
+    mmio.write_cl_delay_in(7)
+    mmio.read_cl_delay_in()
+    mmio.read_cl_z_pos()
+    t = dump(comm, tmp_path)
+    assert NONUM in t.records["num"]
+    assert t.replay(FakeRegisters()) == {}
+
+    # Reads that the fake register file does not reproduce are counted.
+    regs = FakeRegisters()
+    regs.hooks["cl_delay_in"] = lambda regs, val, num: \
+        regs.values.__setitem__(("cl_delay_in", None), val + 1)
+    assert t.replay(regs) == {"read_cl_delay_in": 1}
+
+def test_trace_without_tracing(tmp_path):
+    mmio, comm = board(csr2mp.MicropythonGenerator)
+    with pytest.raises(Exception, match="--trace"):
+        comm.trace_dump(os.path.join(tmp_path, "trace.bin"))
+
+def test_profile(capsys):
+    mmio, comm = board(csr2mp.ProfilingMicropythonGenerator)
+    for i in range(5):
+        mmio.write_dac_sel(i, 0)
+    mmio.read_cl_delay_in()
+    counts = dict(zip(mmio.PROFILE_NAMES, mmio.PROFILE_COUNT))
+    assert counts["write_dac_sel"] == 5
+    assert counts["read_cl_delay_in"] == 1
+    assert sum(counts.values()) == 6
+
+    comm.profile_dump()
+    lines = capsys.readouterr().out.splitlines()
+    assert lines[0] == "name calls total_us avg_us"
+    assert sorted(l.split()[:2] for l in lines[1:]) \
+        == [["read_cl_delay_in", "1"], ["write_dac_sel", "5"]]
+
+    comm.profile_reset()
+    assert sum(mmio.PROFILE_COUNT) == 0 and sum(mmio.PROFILE_TIME) == 0
@@ -0,0 +1,96 @@
+# Copyright 2023 (C) Peter McGoron
+#
+# This file is a part of Upsilon, a free and open source software project.
+# For license terms, refer to the files in `doc/copying` in the Upsilon
+# source distribution.
+#######################################################################
+#
+# Forward a ram_shim ring buffer stored in a file with linux/ram_shim.py.
+
+import io
+import os
+import struct
+import tempfile
+from util import import_upsilon
+
+ram_shim = import_upsilon("linux", "ram_shim")
+
+START = 0x40000000
+LENGTH = 64
+
+class Shim:
+    """ Ring buffer in a file, written like the ram_shim module. """
+    def __init__(self, fname, offset=0):
+        self.fname = fname
+        self.offset = offset
+        self.wr = 0
+        with open(fname, "wb") as f:
+            f.write(bytes(offset + LENGTH))
+
+    def ptr(self):
+        return START + self.wr
+
+    def write(self, samples):
+        with open(self.fname, "r+b") as f:
+            for v in samples:
+                f.seek(self.offset + self.wr)
+                f.write(struct.pack("<i", v))
+                self.wr = (self.wr + 4) % LENGTH
+
+def poll(r):
+    out = io.BytesIO()
+    n = r.poll(out)
+    b = out.getvalue()
+    assert n == len(b)
+    return [v for v, in struct.iter_unpack("<i", b)]
+
+def test_poll_wraparound():
+    with tempfile.TemporaryDirectory() as tmp:
+        shim = Shim(os.path.join(tmp, "mem"), offset=8)
+        r = ram_shim.RamShimReader(shim.ptr, START, LENGTH,
+                                   os.path.join(tmp, "mem"), offset=8, chunk=8)
+        assert poll(r) == []
+        shim.write(range(10))
+        assert poll(r) == list(range(10))
+        # Wraps around the end of the buffer.
+        shim.write(range(10, 20))
+        assert poll(r) == list(range(10, 20))
+        assert r.rd == 4*20 % LENGTH
+        # Exactly up to the end of the buffer.
+        shim.write(range(-1, -13, -1))
+        assert poll(r) == list(range(-1, -13, -1))
+        assert r.rd == 0
+        r.close()
+
+def test_partial_sample():
+    with tempfile.TemporaryDirectory() as tmp:
+        shim = Shim(os.path.join(tmp, "mem"))
+        r = ram_shim.RamShimReader(lambda: shim.ptr() + 2, START, LENGTH,
+                                   os.path.join(tmp, "mem"), offset=0)
+        shim.write([7, 8])
+        # Only the low word of the third sample is written.
+        assert poll(r) == [7, 8]
+        r.close()
+
+def test_short_read():
+    with tempfile.TemporaryDirectory() as tmp:
+        fname = os.path.join(tmp, "mem")
+        with open(fname, "wb") as f:
+            f.write(bytes(16))
+        # The device is shorter than the buffer.
+        r = ram_shim.RamShimReader(lambda: START + 32, START, LENGTH,
+                                   fname, offset=0)
+        try:
+            r.poll(io.BytesIO())
+        except Exception as e:
+            assert "short read" in str(e)
+        else:
+            assert False, "short read was not detected"
+        r.close()
+
+def test_ptr_source():
+    with tempfile.TemporaryDirectory() as tmp:
+        fname = os.path.join(tmp, "mem")
+        with open(fname, "wb") as f:
+            f.write(bytes(12) + struct.pack("<I", 0x40001234))
+        assert ram_shim.ptr_source("0xc", fname)() == 0x40001234
@@ -0,0 +1,62 @@
+# Copyright 2023 (C) Peter McGoron
+#
+# This file is a part of Upsilon, a free and open source software project.
+# For license terms, refer to the files in `doc/copying` in the Upsilon
+# source distribution.
+#######################################################################
+#
+# Run batches through linux/rpc_server.py against a fake register file.
+
+from rpc import Batch, RPCError, local_server, proto
+
+def test_batch_roundtrip():
+    rpc, regs = local_server()
+    b = Batch()
+    b.write("dac_sel", 1, 0)
+    b.write("dac_arm", 1, 0)
+    b.wait("dac_finished", 1, 0)
+    sel = b.read("dac_sel", 0)
+    b.write("cl_delay_in", 1234)
+    delay = b.read("cl_delay_in")
+    res = rpc.execute(b)
+    assert len(res) == 6
+    assert res[sel] == 1
+    assert res[delay] == 1234
+    assert regs.values[("dac_finished", 0)] == 1
+    rpc.close()
+
+def test_wait_timeout():
+    rpc, regs = local_server()
+    b = Batch()
+    b.write("cl_delay_in", 55)
+    b.read("cl_delay_in")
+    b.wait("adc_finished", 1, 0, timeout_ms=20)
+    b.write("cl_delay_in", 66)
+    try:
+        rpc.execute(b)
+    except RPCError as e:
+        assert e.status == proto.STATUS_TIMEOUT
+        assert e.index == 2
+        assert e.results == [0, 55]
+    else:
+        assert False, "wait did not time out"
+    # Operations after the wait were not run.
+    assert regs.read("cl_delay_in") == 55
+    # The server still accepts batches.
+    b = Batch()
+    b.read("cl_delay_in")
+    assert rpc.execute(b) == [55]
+    rpc.close()
+
+def test_signed_read():
+    rpc, regs = local_server()
+    # Raw 18 bit two's complement value from the ADC.
+    regs.values[("adc_recv_buf", 0)] = (1 << 18) - 5
+    b = Batch()
+    adc = b.read("adc_recv_buf", 0)
+    b.write("cl_setpt_in", -1000)
+    setpt = b.read("cl_setpt_in")
+    res = rpc.execute(b)
+    assert res[adc] == -5
+    assert res[setpt] == -1000
+    rpc.close()
@@ -0,0 +1,97 @@
+# Copyright 2023 (C) Peter McGoron
+#
+# This file is a part of Upsilon, a free and open source software project.
+# For license terms, refer to the files in `doc/copying` in the Upsilon
+# source distribution.
+#######################################################################
+#
+# Run queued jobs through linux/worker.py against a fake register file.
+
+import os
+import sys
+import tempfile
+from scheduler import Scheduler, local_worker
+from storage import load
+
+def run(s, **kwargs):
+    log = []
+    failed = s.run(local_worker()[:2], log=log.append, **kwargs)
+    return failed, log
+
+def stop(conn):
+    """ Stop a worker that was not given to ``Scheduler.run``. """
+    w, r, regs = conn
+    w.write(b'{"type": "quit"}\n')
+    w.close()
+    r.read()
+    r.close()
+
+def test_jobs():
+    with tempfile.TemporaryDirectory() as tmp:
+        s = Scheduler(tmp)
+        noise = s.submit("noise", lo=-3, hi=3, samples=5)
+        cl = s.submit("control_loop", setpt=100, P="0.0006", I=0.01,
+                      samples=3, interval_ms=1, stop=True)
+        step = s.submit("step", setpt=10, length=4)
+        bad = s.submit("raster")
+        failed, log = run(s)
+        assert failed == 2, log
+        jobs = {j["id"]: j for j in s.jobs}
+        assert [s.status(jobs[i]) for i in (noise, cl, step, bad)] \
+            == ["done", "done", "failed", "failed"]
+
+        cols, meta = load(s.path(jobs[noise]))
+        assert list(cols["dac"]) == list(range(-3, 3))
+        assert list(cols["n"]) == [5]*6
+        assert meta["metadata"]["job_id"] == noise
+
+        cols, meta = load(s.path(jobs[cl]))
+        assert len(cols["t_ms"]) == 3
+        # P and I are sent as fixed point.
+        assert meta["metadata"]["P"] == round(0.0006 * (1 << 43))
+        assert meta["metadata"]["I"] == round(0.01 * (1 << 43))
+
+        _, meta = load(s.path(jobs[step]))
+        assert "control loop is not running" in meta["error"]
+        _, meta = load(s.path(jobs[bad]))
+        assert "unknown job type" in meta["error"]
+
+        # Only failed jobs are run again, and only with retry.
+        assert s.pending() == []
+        assert [j["id"] for j in s.pending(retry=True)] == [step, bad]
+        failed, log = run(s, retry=True)
+        assert failed == 2 and len(log) == 2, log
+
+def test_no_global_mmio():
+    stop(local_worker())
+    assert "mmio" not in sys.modules
+    assert "worker" not in sys.modules
+
+def test_names():
+    with tempfile.TemporaryDirectory() as tmp:
+        s = Scheduler(os.path.join(tmp, "queue"))
+        for name in ["..", "/tmp/x", "../x", "a/b", ""]:
+            try:
+                s.submit("noise", name)
+            except Exception:
+                pass
+            else:
+                assert False, f"accepted {name!r}"
+        assert s.jobs == []
+
+def test_keep_foreign_directory():
+    with tempfile.TemporaryDirectory() as tmp:
+        s = Scheduler(tmp)
+        s.submit("noise", "data", lo=0, hi=1, samples=4)
+        os.makedirs(os.path.join(tmp, "data"))
+        keep = os.path.join(tmp, "data", "keep")
+        open(keep, "w").close()
+        conn = local_worker()
+        try:
+            s.run(conn[:2])
+        except Exception as e:
+            assert "not a run of job" in str(e)
+        else:
+            assert False, "directory was overwritten"
+        stop(conn)
+        assert os.path.exists(keep)
@@ -0,0 +1,58 @@
+# Copyright 2023 (C) Peter McGoron
+#
+# This file is a part of Upsilon, a free and open source software project.
+# For license terms, refer to the files in `doc/copying` in the Upsilon
+# source distribution.
+#######################################################################
+#
+# Write runs with storage.RunWriter and load them back.
+
+import os
+import tempfile
+import numpy as np
+from storage import RunWriter, load
+
+COLUMNS = {"dac": "i4", "adc": "i8"}
+
+def test_roundtrip():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "run")
+        with RunWriter(path, COLUMNS, {"x": 1}, chunk_rows=4) as w:
+            for i in range(6):
+                w.append(dac=i, adc=-i)
+            w.extend(dac=np.arange(6, 10), adc=-np.arange(6, 10))
+        cols, meta = load(path)
+        assert list(cols["dac"]) == list(range(10))
+        assert list(cols["adc"]) == [-i for i in range(10)]
+        assert meta["complete"] and meta["rows"] == 10
+        assert "error" not in meta
+        assert meta["metadata"] == {"x": 1}
+
+def test_exception_marks_failed():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "run")
+        try:
+            with RunWriter(path, COLUMNS, chunk_rows=4) as w:
+                for i in range(5):
+                    w.append(dac=i, adc=i)
+                raise ValueError("lost connection")
+        except ValueError:
+            pass
+        else:
+            assert False, "exception was swallowed"
+        cols, meta = load(path)
+        assert not meta["complete"]
+        assert "lost connection" in meta["error"]
+        # Rows written before the exception are kept.
+        assert meta["rows"] == 5
+        assert list(cols["dac"]) == list(range(5))
+
+def test_existing_run():
+    with tempfile.TemporaryDirectory() as tmp:
+        RunWriter(tmp, COLUMNS).close()
+        try:
+            RunWriter(tmp, COLUMNS)
+        except Exception as e:
+            assert "already contains a run" in str(e)
+        else:
+            assert False, "run was overwritten"
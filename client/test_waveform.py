@@ -0,0 +1,97 @@
+# Copyright 2023 (C) Peter McGoron
+#
+# This file is a part of Upsilon, a free and open source software project.
+# For license terms, refer to the files in `doc/copying` in the Upsilon
+# source distribution.
+#######################################################################
+#
+# Pack waveforms, diff them, and upload them through a local worker into
+# a file that stands in for board RAM.
+
+import os
+import numpy as np
+import pytest
+import waveform as wf
+from scheduler import WorkerConnection, local_worker
+
+def test_pack_roundtrip():
+    codes = wf.sine(wf.WORD_MAX, 3)
+    codes[0] = wf.WORD_MIN
+    codes[1] = wf.WORD_MAX
+    codes[2] = -1
+    packed = wf.pack(codes)
+    assert packed.dtype == np.dtype("<u2")
+    assert len(packed) == 2*wf.NUM_WORDS
+    assert list(packed[4:6]) == [0xFFFF, 0xF]
+    assert (wf.unpack(packed) == codes).all()
+
+def test_pack_errors():
+    with pytest.raises(Exception, match="samples"):
+        wf.pack(np.zeros(wf.WORD_AMNT))
+    codes = np.zeros(wf.NUM_WORDS, dtype=np.int64)
+    codes[5] = wf.WORD_MAX + 1
+    with pytest.raises(Exception, match="bits"):
+        wf.pack(codes)
+
+def test_diff_blocks():
+    old = wf.pack(wf.triangle(1000))
+    assert wf.diff_blocks(None, old) == [(0, len(old))]
+    assert wf.diff_blocks(old, old.copy()) == []
+
+    codes = wf.unpack(old)
+    # Samples are two RAM words, so each block holds BLOCK_WORDS//2.
+    half = wf.BLOCK_WORDS // 2
+    codes[0] += 1
+    codes[half] += 1
+    codes[-1] += 1
+    new = wf.pack(codes)
+    end = len(new)
+    # The first two blocks are adjacent and merged.
+    assert wf.diff_blocks(old, new) == [(0, 2*wf.BLOCK_WORDS),
+                                        (end - wf.BLOCK_WORDS, end)]
+
+def ram(tmp_path, start):
+    fname = os.path.join(tmp_path, "mem")
+    with open(fname, "wb") as f:
+        f.write(bytes(start + 2*2*wf.NUM_WORDS))
+    return fname
+
+def read_ram(fname, start):
+    with open(fname, "rb") as f:
+        f.seek(start)
+        return np.frombuffer(f.read(), dtype="<u2")
+
+def test_worker_upload(tmp_path):
+    start = 0x100
+    mem = ram(tmp_path, start)
+    worker = WorkerConnection(local_worker()[:2])
+    sent = []
+    send = wf.worker_sender(worker, dev=mem)
+    def count(patch, addr):
+        sent.append(len(patch))
+        send(patch, addr)
+    cache = wf.WaveformCache(os.path.join(tmp_path, "cache"), send=count)
+
+    a = wf.sine(5000, 2)
+    assert cache.upload(a, start) == 2*wf.NUM_WORDS
+    assert (read_ram(mem, start)[:2*wf.NUM_WORDS] == wf.pack(a)).all()
+
+    # Only the changed block is sent.
+    b = a.copy()
+    b[100] += 7
+    assert cache.upload(b, start) == wf.BLOCK_WORDS
+    assert (read_ram(mem, start)[:2*wf.NUM_WORDS] == wf.pack(b)).all()
+    assert cache.upload(b, start) == 0
+    assert len(sent) == 2
+
+    # The same worker is used for every upload.
+    assert cache.upload(a, start, force=True) == 2*wf.NUM_WORDS
+    assert (read_ram(mem, start)[:2*wf.NUM_WORDS] == wf.pack(a)).all()
+    worker.close()
+
+def test_worker_upload_error(tmp_path):
+    worker = WorkerConnection(local_worker()[:2])
+    send = wf.worker_sender(worker, dev=os.path.join(tmp_path, "missing"))
+    with pytest.raises(Exception, match="waveform failed"):
+        send(b"\0"*16, 0)
+    worker.close()
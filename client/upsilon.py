@@ -0,0 +1,186 @@
+#!/usr/bin/python3
+"""
+Copyright 2023 (C) Peter McGoron
+
+This file is a part of Upsilon, a free and open source software project.
+For license terms, refer to the files in `doc/copying` in the Upsilon
+source distribution.
+"""
+
+"""
+Command line entry point for Upsilon client tools.
+
+    ./upsilon.py noise NAME [--sem-target SEM] [--no-plot]
+    ./upsilon.py control-loop [--setpoint S] [-P P] [-I I] [--delay D]
+    ./upsilon.py step NAME SETPOINT [--samples N] [--decimate D]
+    ./upsilon.py store-stream NAME [--input FILE | --board START LENGTH PTR]
+                 [--channels N] [--samples N]
+    ./upsilon.py gen-mmio CSRJSON [--profile | --trace] [-o OUT]
+    ./upsilon.py queue DIR add TYPE [KEY=VALUE ...] [--name NAME]
+    ./upsilon.py queue DIR run [--retry]
+    ./upsilon.py queue DIR list
+
+Only the standard library is imported at startup. NumPy, pandas,
+matplotlib and parallel-ssh are imported by the subcommands that need
+them. ``make test`` checks the startup time against a budget.
+"""
+
+import os
+import sys
+import argparse
+
+def decimal_string(s):
+    """ Argument type for numbers that are passed on as strings. """
+    float(s)
+    return s
+
+def noise(args):
+    import noise_test
+    argv = [args.name]
+    if args.sem_target is not None:
+        argv.append(args.sem_target)
+    noise_test.main(argv, plot=not args.no_plot)
+
+def control_loop(args):
+    import control_loop_test
+    control_loop_test.main(args.setpoint, args.P, args.I, args.delay)
+
+def step(args):
+    import step_response
+    step_response.main(args.name, args.setpoint, args.samples, args.decimate)
+
+def store_stream(args):
+    from psd import iter_chunks
+    from storage import RunWriter, run_metadata
+
+    cols = {f"adc{i}": "i4" for i in range(args.channels)}
+    proc = None
+    if args.board is not None:
+        from util import ram_shim_popen
+        start, length, ptr = args.board
+        proc = ram_shim_popen(int(start, 0), int(length, 0), ptr, args.dev,
+                              None if args.offset is None else int(args.offset, 0))
+        inp = proc.stdout
+    elif args.input == "-":
+        inp = sys.stdin.buffer
+    else:
+        inp = open(args.input, "rb")
+    n = 0
+    try:
+        with inp, RunWriter(args.name, cols, run_metadata(channels=args.channels),
+                            chunk_rows=args.chunk) as w:
+            for c in iter_chunks(inp, args.channels, args.chunk):
+                if args.samples is not None:
+                    c = c[:, :args.samples - n]
+                w.extend(**{f"adc{i}": c[i] for i in range(args.channels)})
+                n += c.shape[1]
+                if n == args.samples:
+                    break
+    finally:
+        if proc is not None:
+            proc.terminate()
+
+def gen_mmio(args):
+    from util import UPSILON_ROOT
+    sys.path.insert(0, os.path.join(UPSILON_ROOT, "gateware"))
+    import csr2mp
+
+    argv = [args.csrjson]
+    if args.profile:
+        argv.append("--profile")
+    if args.trace:
+        argv.append("--trace")
+    if args.output is None:
+        csr2mp.main(argv)
+        return
+    with open(args.output, "w") as f:
+        csr2mp.main(argv, f)
+
+def queue(args):
+    import json
+    from scheduler import Scheduler
+
+    s = Scheduler(args.directory)
+    if args.action == "add":
+        if not args.args:
+            sys.exit("queue add: missing job type")
+        params = {}
+        for a in args.args[1:]:
+            k, _, v = a.partition("=")
+            try:
+                params[k] = json.loads(v)
+            except ValueError:
+                params[k] = v
+        print(s.submit(args.args[0], args.name, **params))
+    elif args.action == "run":
+        if s.run(retry=args.retry) > 0:
+            sys.exit(1)
+    else:
+        for j in s.jobs:
+            print(j["id"], j["name"], s.status(j), json.dumps(j["params"]))
+
+def parser():
+    p = argparse.ArgumentParser(prog="upsilon", description="Upsilon client tools.")
+    sub = p.add_subparsers(dest="command", required=True)
+
+    s = sub.add_parser("noise", help="run the DAC/ADC noise ramp")
+    s.add_argument("name", help="run directory (and CSV name) for results")
+    # Kept as a string, so that the board converts a decimal target
+    # exactly (see to_fraction in linux/comm.py).
+    s.add_argument("--sem-target", type=decimal_string,
+                   help="sample each step until the standard error is below this")
+    s.add_argument("--no-plot", action="store_true", help="do not plot the results")
+    s.set_defaults(func=noise)
+
+    s = sub.add_parser("control-loop", help="start the control loop")
+    s.add_argument("--setpoint", type=int, default=10000, help="setpoint in ADC units")
+    s.add_argument("-P", default="0.0006", help="proportional parameter")
+    s.add_argument("-I", default="0.01", help="integral parameter")
+    s.add_argument("--delay", type=int, default=100, help="cycles between iterations")
+    s.set_defaults(func=control_loop)
+
+    s = sub.add_parser("step", help="record the step response of the control loop")
+    s.add_argument("name", help="run directory for results")
+    s.add_argument("setpoint", type=int, help="new setpoint in ADC units")
+    s.add_argument("--samples", type=int, default=1024, help="samples to record (at most 1024)")
+    s.add_argument("--decimate", type=int, default=1, help="loop iterations between samples")
+    s.set_defaults(func=step)
+
+    s = sub.add_parser("store-stream", help="store a ram_shim sample stream")
+    s.add_argument("name", help="run directory for results")
+    src = s.add_mutually_exclusive_group()
+    src.add_argument("--input", default="-", help="stream file (default: standard input)")
+    src.add_argument("--board", nargs=3, metavar=("START", "LENGTH", "PTR"),
+                     help="run ram_shim.py on the board for the buffer at START "
+                          "of LENGTH bytes, with the write pointer read from PTR "
+                          "(mmio register name or address)")
+    s.add_argument("--dev", default="/dev/mem", help="for --board: device the buffer is read from")
+    s.add_argument("--offset", help="for --board: offset of the buffer in the device")
+    s.add_argument("--samples", type=int, help="stop after this many samples per channel")
+    s.add_argument("--channels", type=int, default=1, help="interleaved channels")
+    s.add_argument("--chunk", type=int, default=65536, help="samples per stored chunk")
+    s.set_defaults(func=store_stream)
+
+    s = sub.add_parser("gen-mmio", help="generate the Micropython mmio module")
+    s.add_argument("csrjson", help="LiteX csr.json file")
+    instr = s.add_mutually_exclusive_group()
+    instr.add_argument("--profile", action="store_true", help="profiling accessors")
+    instr.add_argument("--trace", action="store_true", help="tracing accessors")
+    s.add_argument("-o", "--output", help="output file (default: standard output)")
+    s.set_defaults(func=gen_mmio)
+
+    s = sub.add_parser("queue", help="queue experiments and run them on the board worker")
+    s.add_argument("directory", help="queue directory")
+    s.add_argument("action", choices=["add", "run", "list"])
+    s.add_argument("args", nargs="*", help="for add: job type and KEY=VALUE parameters")
+    s.add_argument("--name", help="for add: run directory name")
+    s.add_argument("--retry", action="store_true", help="for run: run failed jobs again")
+    s.set_defaults(func=queue)
+    return p
+
+def main(argv=None):
+    args = parser().parse_args(argv)
+    args.func(args)
+
+if __name__ == "__main__":
+    main()
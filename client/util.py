@@ -5,9 +5,44 @@ This file is a part of Upsilon, a free and open source software project.
 For license terms, refer to the files in `doc/copying` in the Upsilon
 source distribution.
 """
+import os
 from math import log10, floor
 from decimal import *
 
+UPSILON_ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+def import_upsilon(subdir, name):
+    """
+    Import a module from another directory of the Upsilon source tree
+    without leaving that directory on ``sys.path``.
+
+    The directory is only on ``sys.path`` while the module is executed, so
+    that it can import the modules next to it. The module is stored in
+    ``sys.modules``, so later calls return the same module.
+
+    :param subdir: Directory relative to the root of the source tree.
+    :param name: Module name.
+    """
+    import sys
+    import importlib.util
+    directory = os.path.join(UPSILON_ROOT, subdir)
+    fname = os.path.join(directory, f"{name}.py")
+    mod = sys.modules.get(name)
+    if mod is not None and os.path.realpath(getattr(mod, "__file__", "")) \
+            == os.path.realpath(fname):
+        return mod
+
+    spec = importlib.util.spec_from_file_location(name, fname)
+    mod = importlib.util.module_from_spec(spec)
+    sys.path.insert(0, directory)
+    try:
+        spec.loader.exec_module(mod)
+    finally:
+        sys.path.remove(directory)
+    if name not in sys.modules:
+        sys.modules[name] = mod
+    return mod
+
 def sign_extend(value, bits):
     """
     Interpret ``value`` as a twos-complement integer of ``bits`` length.
@@ -43,6 +78,61 @@ def connect_execute(f, *arg):
     print(f"running {args}")
     return client.run_command(args)
 
+def ssh_popen(f, *arg, host='192.168.2.50', pkey='~/.ssh/upsilon_key'):
+    """
+    Upload and run a script with binary pipes to its standard input
+    and output.
+
+    :return: ``subprocess.Popen`` object.
+    """
+    import subprocess
+    from pssh.clients import SSHClient # require parallel-ssh
+
+    client = SSHClient(host, user='root', pkey=pkey)
+    client.scp_send(f'../linux/{f}', '/root/')
+    args = f'micropython {f} {" ".join([str(s) for s in arg])}'
+    return subprocess.Popen(['ssh', '-i', os.path.expanduser(pkey),
+                             f'root@{host}', args],
+                            stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+
+def ram_shim_popen(start, length, ptr, dev="/dev/mem", offset=None, **kwargs):
+    """
+    Start ``linux/ram_shim.py`` on the board. The forwarded samples are
+    read from ``stdout`` of the returned process.
+
+    :param ptr: Source of the shim write pointer: an mmio register name
+      or an address in ``dev``.
+    :param kwargs: Passed to ``ssh_popen``.
+    :return: ``subprocess.Popen`` object.
+    """
+    arg = [hex(start), hex(length), ptr, dev]
+    if offset is not None:
+        arg.append(hex(offset))
+    return ssh_popen("ram_shim.py", *arg, **kwargs)
+
+def decode_ram_shim(buf):
+    """
+    Decode samples forwarded by ``linux/ram_shim.py``.
+
+    :param buf: Bytes-like object. The length must be a multiple of 4.
+    :return: NumPy array of signed 32 bit samples. The array shares
+      memory with ``buf``.
+    """
+    import numpy as np
+    return np.frombuffer(buf, dtype='<i4')
+
+def decode_capture(buf):
+    """
+    Decode samples read by ``comm.capture_read``.
+
+    :param buf: Bytes-like object. The length must be a multiple of 8.
+    :return: Tuple of NumPy arrays of the measured values (ADC units)
+      and the DAC positions.
+    """
+    import numpy as np
+    a = np.frombuffer(buf, dtype='<i4').reshape(-1, 2)
+    return a[:, 0], a[:, 1]
+
 # Functions for converting to and from fixed point in Python.
 
 def string_to_fixed_point(s, fracnum):
@@ -0,0 +1,267 @@
+"""
+Copyright 2023 (C) Peter McGoron
+
+This file is a part of Upsilon, a free and open source software project.
+For license terms, refer to the files in `doc/copying` in the Upsilon
+source distribution.
+"""
+
+"""
+Waveform builder for the ``waveform`` Verilog module.
+
+The waveform module (gateware/rtl/waveform/waveform.v) plays
+``NUM_WORDS`` samples of ``WORD_WID`` bits. Each sample is stored in
+RAM as two 16 bit words: the low 16 bits, and then the high bits in the
+low part of the next word. Samples are twos-complement DAC codes.
+
+Compiled waveforms are cached on disk by the hash of their packed
+contents. The cache remembers which waveform was last uploaded to each
+board address, so uploading a new waveform only sends the blocks that
+differ. Patches are applied by the resident worker (``linux/worker.py``),
+so switching waveforms does not start a new connection.
+"""
+
+import os
+import json
+import struct
+import hashlib
+import numpy as np
+
+# Index of the last sample, as the WORD_AMNT parameter of the gateware.
+WORD_AMNT = 2047
+NUM_WORDS = WORD_AMNT + 1
+WORD_WID = 20
+RAM_WORD_WID = 16
+RAM_WORD_INCR = 2
+
+WORD_MIN = -(1 << (WORD_WID - 1))
+WORD_MAX = (1 << (WORD_WID - 1)) - 1
+
+# Size of an upload block, in 16 bit RAM words.
+BLOCK_WORDS = 64
+
+def _phase(periods):
+    return 2*np.pi*periods*np.arange(NUM_WORDS)/NUM_WORDS
+
+def _to_codes(values):
+    return np.rint(values).astype(np.int64)
+
+def sine(amplitude, periods=1, offset=0, phase=0):
+    """
+    :param amplitude: Amplitude in DAC units.
+    :param periods: Number of periods in one waveform cycle.
+    :param offset: DAC code at the center of the wave.
+    :param phase: Phase shift in radians.
+    :return: Array of DAC codes.
+    """
+    return _to_codes(offset + amplitude*np.sin(_phase(periods) + phase))
+
+def triangle(amplitude, periods=1, offset=0):
+    """
+    :param amplitude: Amplitude in DAC units.
+    :param periods: Number of periods in one waveform cycle.
+    :param offset: DAC code at the center of the wave.
+    :return: Array of DAC codes.
+    """
+    x = (periods*np.arange(NUM_WORDS)/NUM_WORDS) % 1
+    return _to_codes(offset + amplitude*(1 - 4*np.abs(x - 0.5)))
+
+def chirp(amplitude, f0, f1, offset=0):
+    """
+    Linear frequency sweep.
+
+    :param amplitude: Amplitude in DAC units.
+    :param f0: Starting frequency, in periods per waveform cycle.
+    :param f1: Ending frequency, in periods per waveform cycle.
+    :param offset: DAC code at the center of the wave.
+    :return: Array of DAC codes.
+    """
+    t = np.arange(NUM_WORDS)/NUM_WORDS
+    return _to_codes(offset + amplitude*np.sin(2*np.pi*(f0*t + (f1 - f0)*t*t/2)))
+
+def arbitrary(values):
+    """
+    :param values: Sequence of ``NUM_WORDS`` DAC codes.
+    :return: Array of DAC codes.
+    """
+    return _to_codes(np.asarray(values))
+
+def pack(codes):
+    """
+    Pack DAC codes into the RAM layout read by ``bram_interface``.
+
+    :param codes: Sequence of ``NUM_WORDS`` DAC codes.
+    :return: Array of ``2*NUM_WORDS`` unsigned 16 bit RAM words.
+    :raises Exception: When the length is wrong or a code does not fit
+      in ``WORD_WID`` bits.
+    """
+    codes = np.asarray(codes, dtype=np.int64)
+    if codes.shape != (NUM_WORDS,):
+        raise Exception(f"waveform must have {NUM_WORDS} samples, got {codes.shape}")
+    if codes.min() < WORD_MIN or codes.max() > WORD_MAX:
+        raise Exception(f"waveform exceeds {WORD_WID} bits")
+
+    codes = codes & ((1 << WORD_WID) - 1)
+    packed = np.empty(2*NUM_WORDS, dtype='<u2')
+    packed[0::2] = codes & 0xFFFF
+    packed[1::2] = codes >> RAM_WORD_WID
+    return packed
+
+def unpack(packed):
+    """
+    Inverse of ``pack``.
+
+    :param packed: Array of ``2*NUM_WORDS`` RAM words.
+    :return: Array of DAC codes.
+    """
+    packed = np.asarray(packed, dtype=np.int64)
+    codes = packed[0::2] | ((packed[1::2] & 0xF) << RAM_WORD_WID)
+    return np.where(codes >> (WORD_WID - 1), codes - (1 << WORD_WID), codes)
+
+def diff_blocks(old, new):
+    """
+    Find the ranges of RAM words that differ between two packed
+    waveforms.
+
+    :param old: Packed waveform on the board, or ``None`` if unknown.
+    :param new: Packed waveform to upload.
+    :return: List of ``(start, end)`` word indices. Adjacent changed
+      blocks are merged.
+    """
+    if old is None:
+        return [(0, len(new))]
+    changed = (np.asarray(old) != np.asarray(new)).reshape(-1, BLOCK_WORDS).any(axis=1)
+    runs = []
+    for blk in np.flatnonzero(changed):
+        start = int(blk)*BLOCK_WORDS
+        if runs and runs[-1][1] == start:
+            runs[-1] = (runs[-1][0], start + BLOCK_WORDS)
+        else:
+            runs.append((start, start + BLOCK_WORDS))
+    return runs
+
+def make_patch(packed, runs):
+    """
+    Make a patch file for ``linux/waveform_load.py``.
+
+    Each record is a little endian 32 bit byte offset, a 32 bit byte
+    length, and the data.
+    """
+    b = bytearray()
+    for start, end in runs:
+        data = packed[start:end].tobytes()
+        b += struct.pack('<II', start*RAM_WORD_INCR, len(data))
+        b += data
+    return bytes(b)
+
+def worker_sender(worker, dev="/dev/mem"):
+    """
+    :param worker: ``scheduler.WorkerConnection``.
+    :param dev: Device on the board that holds the waveform RAM.
+    :return: Function that takes a patch and a start address and applies
+      the patch through ``worker``.
+    """
+    import base64
+    def send(patch, start_addr):
+        worker.call("waveform", start_addr=start_addr, dev=dev,
+                    patch=base64.b64encode(patch).decode())
+    return send
+
+class WaveformCache:
+    """
+    On-disk cache of compiled waveforms.
+    """
+    def __init__(self, directory="~/.cache/upsilon/waveform", send=None):
+        """
+        :param directory: Cache directory. It is created if it does not
+          exist.
+        :param send: Function that takes a patch and a start address and
+          applies the patch on the board. Defaults to ``worker_sender``
+          with a worker that is started at the first upload and kept
+          running.
+        """
+        self.dir = os.path.expanduser(directory)
+        os.makedirs(self.dir, exist_ok=True)
+        self.statefile = os.path.join(self.dir, "board.json")
+        self.send = send
+
+    def _path(self, h):
+        return os.path.join(self.dir, f"{h}.npy")
+
+    def compile(self, codes):
+        """
+        Pack a waveform and store it in the cache.
+
+        :param codes: Sequence of DAC codes.
+        :return: Tuple of the content hash and the packed waveform.
+        """
+        packed = pack(codes)
+        h = hashlib.sha256(packed.tobytes()).hexdigest()
+        if not os.path.exists(self._path(h)):
+            np.save(self._path(h), packed)
+        return h, packed
+
+    def get(self, h):
+        """
+        :return: Packed waveform with hash ``h``, or ``None``.
+        """
+        try:
+            return np.load(self._path(h))
+        except FileNotFoundError:
+            return None
+
+    def _state(self):
+        try:
+            with open(self.statefile) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+
+    def _store_state(self, state):
+        tmp = self.statefile + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(state, f)
+        os.replace(tmp, self.statefile)
+
+    def invalidate(self, host=None):
+        """
+        Forget what is stored on the board (e.g. after a reboot).
+
+        :param host: Board to forget. If ``None``, forget all boards.
+        """
+        state = self._state()
+        if host is None:
+            state = {}
+        else:
+            state = {k: v for k, v in state.items() if not k.startswith(f"{host}:")}
+        self._store_state(state)
+
+    def upload(self, codes, start_addr, host="192.168.2.50", force=False):
+        """
+        Upload a waveform, sending only the blocks that changed since
+        the last upload to the same address.
+
+        :param codes: Sequence of DAC codes.
+        :param start_addr: Physical address of the waveform in board RAM.
+        :param host: Board address. Used to key the upload state.
+        :param force: Upload the whole waveform.
+        :return: Number of RAM words sent.
+        """
+        h, packed = self.compile(codes)
+        key = f"{host}:{start_addr:#x}"
+        state = self._state()
+        old = None
+        if not force and key in state:
+            if state[key] == h:
+                return 0
+            old = self.get(state[key])
+
+        runs = diff_blocks(old, packed)
+        if runs:
+            if self.send is None:
+                from scheduler import WorkerConnection
+                self.send = worker_sender(WorkerConnection())
+            self.send(make_patch(packed, runs), start_addr)
+        state[key] = h
+        self._store_state(state)
+        return sum(end - start for start, end in runs)
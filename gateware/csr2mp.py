@@ -97,12 +97,24 @@ class InterfaceGenerator:
         """ Print header of file. """
         pass
 
+    def scaled_fun(self, reg, optype):
+        """ Print function for fixed point reads/writes to register. """
+        pass
+    def footer(self):
+        """ Print footer of file. """
+        return ""
+
     def print_file(self):
         self.print(self.header())
         for r in self.csr.registers:
-            self.print(self.fun(r, "read"))
-            if not r.rwperm != "read-only":
-                self.print(self.fun(r, "write"))
+            optypes = ["read"]
+            if r.rwperm != "read-only":
+                optypes.append("write")
+            for optype in optypes:
+                self.print(self.fun(r, optype))
+                if r.frac != 0:
+                    self.print(self.scaled_fun(r, optype))
+        self.print(self.footer())
 
 class MicropythonGenerator(InterfaceGenerator):
     def __init__(self, *args, **kwargs):
@@ -112,7 +124,8 @@ class MicropythonGenerator(InterfaceGenerator):
         addr = self.csr.get_reg_addr(reg, num)
         if reg.regsize in [8, 16, 32]:
             return [f"machine.mem{reg.regsize}[{addr}]"]
-        return [f"machine.mem32[{addr + 4}]", f"machine.mem32[{addr}]"]
+        # Most significant word first. See linux kernel, include/linux/litex.h
+        return [f"machine.mem32[{addr}]", f"machine.mem32[{addr + 4}]"]
 
     def print_write_register(self, indent, varname, reg, num):
         acc = self.get_accessor(reg, num)
@@ -120,39 +133,50 @@ class MicropythonGenerator(InterfaceGenerator):
             return f'{indent}{acc[0]} = {varname}\n'
         else:
             assert len(acc) == 2
-            # Little Endian. See linux kernel, include/linux/litex.h
-            return f'{indent}{acc[1]} = {varname} & 0xFFFFFFFF\n' + \
-                   f'{indent}{acc[0]} = {varname} >> 32\n'
+            return f'{indent}{acc[0]} = {varname} >> 32\n' + \
+                   f'{indent}{acc[1]} = {varname} & 0xFFFFFFFF\n'
 
     def print_read_register(self, indent, varname, reg, num):
         acc = self.get_accessor(reg, num)
         if len(acc) == 1:
-            return f'{indent}return {acc[0]}\n'
+            expr = acc[0]
         else:
             assert len(acc) == 2
-            return f'{indent}return {acc[0]} | ({acc[1]} << 32)\n'
+            expr = f'({acc[0]} << 32) | {acc[1]}'
+        if reg.signed:
+            # Sign extend by flipping the sign bit and subtracting it.
+            sign = 1 << (reg.blen - 1)
+            return f'{indent}return (({expr}) ^ {sign:#x}) - {sign:#x}\n'
+        return f'{indent}return {expr}\n'
+
+    def funname(self, reg, optype):
+        """ Name of the function that accesses the register. """
+        return f'{optype}_{reg.name}'
+
+    def args(self, reg, optype):
+        """ Argument names of the function that accesses the register. """
+        args = []
+        if optype == 'write':
+            args.append('val')
+        if reg.num != 1:
+            args.append('num')
+        return args
 
     def fun(self, reg, optype):
         rs = ""
         def a(s):
             nonlocal rs
             rs = rs + s
-        a(f'def {optype}_{reg.name}(')
+        a(f'def {self.funname(reg, optype)}({", ".join(self.args(reg, optype))}):\n')
 
-        printed_argument = False
         if optype == 'write':
-            a('val')
-            printed_argument = True
             pfun = self.print_write_register
+            if reg.signed:
+                # Accept negative Python integers.
+                a(f'\tval &= {(1 << reg.blen) - 1:#x}\n')
         else:
             pfun = self.print_read_register
 
-        if reg.num != 1:
-            if printed_argument:
-                a(', ')
-            a('num')
-        a('):\n')
-
         if reg.num == 1:
             a(pfun('\t', 'val', reg, None))
         else:
@@ -164,16 +188,156 @@ class MicropythonGenerator(InterfaceGenerator):
                 a(f'num == {i}:\n')
                 a(pfun('\t\t', 'val', reg, i))
             a(f'\telse:\n')
-            a(f'\t\traise Exception(regnum)\n')
+            a(f'\t\traise Exception(num)\n')
         a('\n')
 
         return rs
 
+    def scaled_fun(self, reg, optype):
+        """
+        Fixed point accessors take and return floats. They call the
+        public integer accessors.
+        """
+        name = MicropythonGenerator.funname(self, reg, optype)
+        args = self.args(reg, optype)
+        rs = f'def {name}_scaled({", ".join(args)}):\n'
+        if optype == 'write':
+            args[0] = f'int(val * {1 << reg.frac})'
+            rs += f'\t{name}({", ".join(args)})\n'
+        else:
+            rs += f'\treturn {name}({", ".join(args)}) * {1 / (1 << reg.frac)!r}\n'
+        return rs + '\n'
+
     def header(self):
         return "import machine\n"
 
+class InstrumentedMicropythonGenerator(MicropythonGenerator):
+    """
+    Generator that wraps each accessor with instrumentation code.
+
+    The uninstrumented accessor is emitted with an underscore prefix and
+    the public accessor calls it. Each accessor is assigned an index in
+    ``self.funs``. Subclasses implement ``wrap``.
+    """
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.funs = []
+
+    def funname(self, reg, optype):
+        return '_' + super().funname(reg, optype)
+
+    def wrap(self, reg, optype, idx, call):
+        """
+        Body of the public accessor.
+
+        :param idx: Index of the accessor in ``self.funs``.
+        :param call: Expression that calls the raw accessor.
+        """
+        pass
+
+    def fun(self, reg, optype):
+        name = super().funname(reg, optype)
+        idx = len(self.funs)
+        self.funs.append(name)
+        args = ", ".join(self.args(reg, optype))
+        rs = super().fun(reg, optype)
+        rs += f'def {name}({args}):\n'
+        rs += self.wrap(reg, optype, idx, f'{self.funname(reg, optype)}({args})')
+        rs += '\n'
+        return rs
+
+class ProfilingMicropythonGenerator(InstrumentedMicropythonGenerator):
+    """
+    Record the number of calls and the total time spent in each accessor.
+
+    The counters are preallocated arrays ``PROFILE_COUNT`` and
+    ``PROFILE_TIME`` (in microseconds), indexed like ``PROFILE_NAMES``.
+    """
+    def wrap(self, reg, optype, idx, call):
+        return f'\tt = time.ticks_us()\n' + \
+               f'\tv = {call}\n' + \
+               f'\tPROFILE_COUNT[{idx}] += 1\n' + \
+               f'\tPROFILE_TIME[{idx}] += time.ticks_diff(time.ticks_us(), t)\n' + \
+               f'\treturn v\n'
+
+    def header(self):
+        return "import machine\nimport time\nfrom array import array\n"
+
+    def footer(self):
+        names = ", ".join([f"'{n}'" for n in self.funs])
+        return f"PROFILE_NAMES = ({names},)\n" + \
+               f"PROFILE_COUNT = array('Q', [0]*{len(self.funs)})\n" + \
+               f"PROFILE_TIME = array('Q', [0]*{len(self.funs)})\n"
+
+class TracingMicropythonGenerator(InstrumentedMicropythonGenerator):
+    """
+    Log every register access into a preallocated ring buffer.
+
+    Each record is packed as ``TRACE_FMT``: the index of the accessor
+    in ``TRACE_NAMES``, the register number (255 for registers without
+    a numerical suffix), the value read or written (as an unsigned 64 bit
+    integer) and ``time.ticks_us()``. ``TRACE_POS`` holds the index of
+    the next record and the total number of records written.
+    """
+    def __init__(self, *args, trace_len=65536, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.trace_len = trace_len
+
+    def wrap(self, reg, optype, idx, call):
+        num = 'num' if reg.num != 1 else '255'
+        if optype == 'write':
+            return f'\t_trace({idx}, {num}, val)\n' + \
+                   f'\t{call}\n'
+        return f'\tv = {call}\n' + \
+               f'\t_trace({idx}, {num}, v)\n' + \
+               f'\treturn v\n'
+
+    def header(self):
+        return "import machine\nimport time\nimport struct\nfrom array import array\n" + \
+               "TRACE_FMT = '<HBQI'\n" + \
+               "TRACE_REC = struct.calcsize(TRACE_FMT)\n" + \
+               f"TRACE_LEN = {self.trace_len}\n" + \
+               "TRACE_BUF = bytearray(TRACE_LEN*TRACE_REC)\n" + \
+               "TRACE_POS = array('Q', [0, 0])\n" + \
+               "def _trace(i, num, v):\n" + \
+               "\tp = TRACE_POS[0]\n" + \
+               "\tstruct.pack_into(TRACE_FMT, TRACE_BUF, p*TRACE_REC, i, num, v & 0xFFFFFFFFFFFFFFFF, time.ticks_us())\n" + \
+               "\tTRACE_POS[0] = 0 if p == TRACE_LEN - 1 else p + 1\n" + \
+               "\tTRACE_POS[1] += 1\n\n"
+
+    def footer(self):
+        names = ", ".join([f"'{n}'" for n in self.funs])
+        return f"TRACE_NAMES = ({names},)\n"
+
+def main(argv=None, outf=None):
+    """
+    :param argv: Command line arguments. Defaults to ``sys.argv[1:]``.
+    :param outf: Text stream the module is written to. Defaults to
+      standard output.
+    """
+    if outf is None:
+        outf = sys.stdout
+    parser = argparse.ArgumentParser(description="Generate the Micropython mmio module.")
+    parser.add_argument("csrjson", help="LiteX csr.json file")
+    instr = parser.add_mutually_exclusive_group()
+    instr.add_argument("--profile", action="store_true",
+                       help="record call counts and time spent in each accessor")
+    instr.add_argument("--trace", action="store_true",
+                       help="log every access into a ring buffer")
+    parser.add_argument("--trace-len", type=int, default=65536,
+                        help="number of records in the trace ring buffer")
+    args = parser.parse_args(argv)
+
+    csrh = CSRHandler(args.csrjson, mmio_descr.registers)
+    for r in mmio_descr.registers:
+        csrh.update_reg(r)
+    if args.profile:
+        gen = ProfilingMicropythonGenerator(csrh, outf)
+    elif args.trace:
+        gen = TracingMicropythonGenerator(csrh, outf, trace_len=args.trace_len)
+    else:
+        gen = MicropythonGenerator(csrh, outf)
+    gen.print_file()
+
 if __name__ == "__main__":
-   csrh = CSRHandler(sys.argv[1], mmio_descr.registers)
-   for r in mmio_descr.registers:
-       csrh.update_reg(r)
-   MicropythonGenerator(csrh, sys.stdout).print_file()
+    main()
@@ -0,0 +1,22 @@
+# Copyright 2023 (C) Peter McGoron
+# This file is a part of Upsilon, a free and open source software project.
+# For license terms, refer to the files in `doc/copying` in the Upsilon
+# source distribution.
+#
+# Fake "machine" module for running the generated mmio module without
+# hardware. Memory reads return the last value written (or 0).
+
+class _Mem:
+    def __init__(self, mask):
+        self.mask = mask
+        self.mem = {}
+
+    def __getitem__(self, addr):
+        return self.mem.get(addr, 0)
+
+    def __setitem__(self, addr, val):
+        self.mem[addr] = val & self.mask
+
+mem8 = _Mem(0xFF)
+mem16 = _Mem(0xFFFF)
+mem32 = _Mem(0xFFFFFFFF)
@@ -0,0 +1,82 @@
+# Copyright 2023 (C) Peter McGoron
+# This file is a part of Upsilon, a free and open source software project.
+# For license terms, refer to the files in `doc/copying` in the Upsilon
+# source distribution.
+#
+# Run the generated mmio module without hardware: a CSR map with an
+# address for every register, and a fake "machine" module (in fake/) whose
+# memory reads return the last value written.
+
+import io
+import os
+import sys
+import json
+import types
+import tempfile
+import importlib.util
+import csr2mp
+import mmio_descr
+
+FAKE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fake")
+
+def write_fake_csr(fname):
+    """ Write a ``csr.json`` with an address for every register. """
+    regs = {}
+    addr = 0xF0000000
+    for r in mmio_descr.registers:
+        for i in ([None] if r.num == 1 else range(r.num)):
+            name = f"base_{r.name}" if i is None else f"base_{r.name}_{i}"
+            regs[name] = {"addr": addr}
+            addr += 8
+    with open(fname, "w") as f:
+        json.dump({"csr_registers": regs}, f)
+
+def generator(csrjson, cls=csr2mp.MicropythonGenerator, outf=None, **kwargs):
+    """
+    :param csrjson: Path of a ``csr.json``, e.g. from ``write_fake_csr``.
+    :param cls: Generator class.
+    :param outf: Output stream. Defaults to a new ``io.StringIO``.
+    :param kwargs: Passed to ``cls``.
+    :return: Generator for all registers in ``mmio_descr.registers``.
+    """
+    csrh = csr2mp.CSRHandler(csrjson, mmio_descr.registers)
+    for r in mmio_descr.registers:
+        csrh.update_reg(r)
+    return cls(csrh, outf if outf is not None else io.StringIO(), **kwargs)
+
+def machine():
+    """ :return: New fake ``machine`` module with empty memory. """
+    spec = importlib.util.spec_from_file_location("machine",
+            os.path.join(FAKE_DIR, "machine.py"))
+    mod = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(mod)
+    return mod
+
+def load_mmio(cls=csr2mp.MicropythonGenerator, **kwargs):
+    """
+    Generate an mmio module for a fake CSR map and run it against a new
+    fake ``machine``. ``sys.modules`` is left unchanged.
+
+    :param cls: Generator class.
+    :param kwargs: Passed to ``cls``.
+    :return: Tuple of the mmio module, the ``machine`` module and the
+      ``CSRHandler``.
+    """
+    with tempfile.TemporaryDirectory() as tmp:
+        csrjson = os.path.join(tmp, "csr.json")
+        write_fake_csr(csrjson)
+        gen = generator(csrjson, cls, **kwargs)
+    gen.print_file()
+
+    m = machine()
+    mod = types.ModuleType("mmio")
+    saved = sys.modules.get("machine")
+    sys.modules["machine"] = m
+    try:
+        exec(gen.outf.getvalue(), mod.__dict__)
+    finally:
+        if saved is None:
+            del sys.modules["machine"]
+        else:
+            sys.modules["machine"] = saved
+    return mod, m, gen.csr
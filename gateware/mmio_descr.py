@@ -1,29 +1,37 @@
 import textwrap
 
 class Descr:
-    def __init__(self, name, blen, rwperm, num, descr):
+    def __init__(self, name, blen, rwperm, num, descr, signed=False, frac=0):
         """
         :param name: Name of the pin without numerical suffix.
         :param blen: Bit length of the pin.
         :param doc: Restructured text documentation of the register.
         :param num: The amount of registers of the same type.
         :param read_only: A string that must be either "read-only" or "write-write".
+        :param signed: True if the register is a twos-complement number.
+        :param frac: Number of fractional bits if the register is a fixed
+          point number.
         """
         self.name = name
         self.blen = blen
         self.doc = textwrap.dedent(descr)
         self.num = num
         self.rwperm = rwperm
+        self.signed = signed
+        self.frac = frac
 
     @classmethod
     def from_dict(cls, jsdict, name):
-        return cls(name, jsdict[name]["len"], jsdict[name]["ro"], jsdict[name]["num"], jsdict[name]["doc"])
+        return cls(name, jsdict[name]["len"], jsdict[name]["ro"], jsdict[name]["num"], jsdict[name]["doc"],
+                   jsdict[name].get("signed", False), jsdict[name].get("frac", 0))
     def store_to_dict(self, d):
         d[self.name] = {
                 "len": self.blen,
                 "doc": self.doc,
                 "num": self.num,
-                "ro": ro
+                "ro": self.rwperm,
+                "signed": self.signed,
+                "frac": self.frac,
                 }
 
 registers = [
@@ -91,7 +99,7 @@ registers = [
 
                 This register only changes if an SPI transfer is triggered by the MMIO
                 registers. SPI transfers by other masters will not affect this register.
-                buffer."""),
+                buffer.""", signed=True),
 
         Descr("dac_sel", 2, "read-write", 8, """\
                 Select which on-FPGA SPI master controls the DAC.
@@ -182,7 +190,7 @@ registers = [
 
                 This is a twos-complement number in ADC units.
 
-                This is a parameter: see ``cl_assert_change``."""),
+                This is a parameter: see ``cl_assert_change``.""", signed=True),
         Descr("cl_P_in", 64, "read-write", 1, """\
                 Proportional parameter of the control loop.
 
@@ -190,7 +198,7 @@ registers = [
                 bits and 43 fractional bits. This is applied to the error
                 in DAC units.
 
-                This is a parameter: see ``cl_assert_change``."""),
+                This is a parameter: see ``cl_assert_change``.""", signed=True, frac=43),
         Descr("cl_I_in", 64, "read-write", 1, """\
                 Integral parameter of the control loop.
 
@@ -198,7 +206,7 @@ registers = [
                 bits and 43 fractional bits. This is applied to the error
                 in DAC units.
 
-                This is a parameter: see ``cl_assert_change``."""),
+                This is a parameter: see ``cl_assert_change``.""", signed=True, frac=43),
         Descr("cl_delay_in", 16, "read-write", 1, """\
                 Delay parameter of the loop.
 
@@ -214,8 +222,91 @@ registers = [
                 the loop should wait between loop executions."""),
         Descr("cl_z_pos", 20, "read-only", 1, """\
                 Control loop DAC Z position.
-                """),
+                """, signed=True),
         Descr("cl_z_measured", 18, "read-only", 1, """\
                 Control loop ADC Z position.
-                """),
+                """, signed=True),
+
+        Descr("cl_sp_load_addr", 10, "read-write", 1, """\
+                Address in the setpoint table written by ``cl_sp_load_data``."""),
+        Descr("cl_sp_load_data", 18, "read-write", 1, """\
+                Setpoint written to the setpoint table.
+
+                This is a twos-complement number in ADC units. While
+                ``cl_sp_load_write`` is high, this value is written to
+                ``cl_sp_load_addr`` on every clock cycle, so a table is loaded
+                by raising ``cl_sp_load_write`` and then writing the address
+                and data of each entry.""", signed=True),
+        Descr("cl_sp_load_write", 1, "read-write", 1, """\
+                Write enable of the setpoint table. Lower this bit after loading
+                the table."""),
+        Descr("cl_sp_last", 10, "read-write", 1, """\
+                Index of the last setpoint in the table that is played."""),
+        Descr("cl_sp_interval", 32, "read-write", 1, """\
+                Number of clock cycles each setpoint in the table is held.
+
+                This is an unsigned number. ``0`` is treated as ``1``."""),
+        Descr("cl_sp_loop", 1, "read-write", 1, """\
+                When this bit is high, the setpoint table restarts from the
+                first entry after the last entry. Otherwise the table is played
+                once."""),
+        Descr("cl_sp_arm", 1, "read-write", 1, """\
+                Start playing the setpoint table.
+
+                While the table is playing, the control loop takes its setpoint
+                from the table at the start of every iteration instead of from
+                ``cl_setpt_in``. The integral term is not reset when the setpoint
+                changes. When the table finishes, the last setpoint is kept until
+                new parameters are applied with ``cl_assert_change``.
+
+                Lower this bit to stop playing and rewind the table."""),
+        Descr("cl_sp_running", 1, "read-only", 1, """\
+                This bit is high while the setpoint table is playing."""),
+        Descr("cl_sp_finished", 1, "read-only", 1, """\
+                This bit is high after the setpoint table has been played once
+                without ``cl_sp_loop``. It is lowered when ``cl_sp_arm`` is
+                lowered."""),
+        Descr("cl_sp_index", 10, "read-only", 1, """\
+                Index of the setpoint currently being played."""),
+
+        Descr("cl_cap_arm", 1, "read-write", 1, """\
+                Arm the control loop capture buffer.
+
+                When armed, the buffer waits for the trigger selected by
+                ``cl_cap_trig`` and then records ``cl_z_measured`` and
+                ``cl_z_pos`` at the end of every ``cl_cap_decimate`` loop
+                iterations, starting with the first iteration after the
+                trigger.
+
+                Lower this bit to reset the buffer. The recorded data can
+                still be read after the buffer is reset."""),
+        Descr("cl_cap_trig", 2, "read-write", 1, """\
+                Trigger of the capture buffer.
+
+                Valid settings:
+
+                * ``0``: Start recording when ``cl_cap_arm`` is raised.
+                * ``1``: Start recording when ``cl_change_made`` is raised.
+                * ``2``: Start recording when the setpoint table starts
+                  playing."""),
+        Descr("cl_cap_decimate", 16, "read-write", 1, """\
+                Number of loop iterations between recorded samples.
+
+                This is an unsigned number. ``0`` is treated as ``1``."""),
+        Descr("cl_cap_last", 10, "read-write", 1, """\
+                Index of the last sample recorded."""),
+        Descr("cl_cap_triggered", 1, "read-only", 1, """\
+                This bit is high after the capture buffer has been triggered."""),
+        Descr("cl_cap_finished", 1, "read-only", 1, """\
+                This bit is high after sample ``cl_cap_last`` has been
+                recorded."""),
+        Descr("cl_cap_count", 11, "read-only", 1, """\
+                Number of samples recorded since the buffer was triggered."""),
+        Descr("cl_cap_read_addr", 10, "read-write", 1, """\
+                Index of the sample read by ``cl_cap_measured`` and
+                ``cl_cap_pos``."""),
+        Descr("cl_cap_measured", 18, "read-only", 1, """\
+                Recorded ADC Z position at ``cl_cap_read_addr``.""", signed=True),
+        Descr("cl_cap_pos", 20, "read-only", 1, """\
+                Recorded DAC Z position at ``cl_cap_read_addr``.""", signed=True),
         ]
@@ -257,7 +257,11 @@ m4_define(ADC_PORTS_CONTROL_LOOP, (ADC_PORTS + 1))
 m4_define(CL_CONSTS_WID, (CL_CONSTS_WHOLE + CL_CONSTS_FRAC))
 m4_define(CL_DATA_WID, CL_CONSTS_WID)
 	parameter CL_READ_DAC_DELAY = 5,
-	parameter CL_CYCLE_COUNT_WID = 18
+	parameter CL_CYCLE_COUNT_WID = 18,
+	parameter CL_SP_ADDR_WID = 10,
+	parameter CL_SP_INTERVAL_WID = 32,
+	parameter CL_CAP_ADDR_WID = 10,
+	parameter CL_CAP_DECIMATE_WID = 16
 ) (
 	input clk,
 	input rst_L,
@@ -302,7 +306,29 @@ m4_define(CL_DATA_WID, CL_CONSTS_WID)
 
 	output [CL_CYCLE_COUNT_WID-1:0] cl_cycle_count,
 	output [DAC_DATA_WID-1:0] cl_z_pos,
-	output [ADC_TYPE1_WID-1:0] cl_z_measured
+	output [ADC_TYPE1_WID-1:0] cl_z_measured,
+
+	input [CL_SP_ADDR_WID-1:0] cl_sp_load_addr,
+	input [ADC_TYPE1_WID-1:0] cl_sp_load_data,
+	input cl_sp_load_write,
+	input [CL_SP_ADDR_WID-1:0] cl_sp_last,
+	input [CL_SP_INTERVAL_WID-1:0] cl_sp_interval,
+	input cl_sp_loop,
+	input cl_sp_arm,
+	output cl_sp_running,
+	output cl_sp_finished,
+	output [CL_SP_ADDR_WID-1:0] cl_sp_index,
+
+	input cl_cap_arm,
+	input [1:0] cl_cap_trig,
+	input [CL_CAP_DECIMATE_WID-1:0] cl_cap_decimate,
+	input [CL_CAP_ADDR_WID-1:0] cl_cap_last,
+	output cl_cap_triggered,
+	output cl_cap_finished,
+	output [CL_CAP_ADDR_WID:0] cl_cap_count,
+	input [CL_CAP_ADDR_WID-1:0] cl_cap_read_addr,
+	output [ADC_TYPE1_WID-1:0] cl_cap_measured,
+	output [DAC_DATA_WID-1:0] cl_cap_pos
 );
 
 assign set_low = 0;
@@ -346,6 +372,29 @@ m4_adc_switch(ADC_TYPE1_WID, 5, ADC_PORTS);
 m4_adc_switch(ADC_TYPE1_WID, 6, ADC_PORTS);
 m4_adc_switch(ADC_TYPE1_WID, 7, ADC_PORTS);
 
+wire [ADC_TYPE1_WID-1:0] cl_sp_setpt;
+wire cl_cycle_done;
+
+setpt_table #(
+	.DAT_WID(ADC_TYPE1_WID),
+	.ADDR_WID(CL_SP_ADDR_WID),
+	.TIMER_WID(CL_SP_INTERVAL_WID)
+) cl_sp (
+	.clk(clk),
+	.rst_L(rst_L),
+	.load_addr(cl_sp_load_addr),
+	.load_data(cl_sp_load_data),
+	.load_write(cl_sp_load_write),
+	.arm(cl_sp_arm),
+	.loop(cl_sp_loop),
+	.last(cl_sp_last),
+	.interval(cl_sp_interval),
+	.running(cl_sp_running),
+	.finished(cl_sp_finished),
+	.index(cl_sp_index),
+	.setpt(cl_sp_setpt)
+);
+
 control_loop #(
 	.ADC_WID(ADC_TYPE1_WID),
 	.ADC_WID_SIZ(ADC_WID_SIZ),
@@ -388,9 +437,40 @@ control_loop #(
 	.P_in(cl_P_in),
 	.I_in(cl_I_in),
 	.delay_in(cl_delay_in),
+	.setpt_table_en(cl_sp_running),
+	.setpt_table(cl_sp_setpt),
 	.cycle_count(cl_cycle_count),
 	.z_pos(cl_z_pos),
-	.z_measured(cl_z_measured)
+	.z_measured(cl_z_measured),
+	.cycle_done(cl_cycle_done)
+);
+
+/* Trigger 1 is a parameter change (cl_assert_change), trigger 2 is the
+ * start of the setpoint table. */
+cl_capture #(
+	.ADC_WID(ADC_TYPE1_WID),
+	.DAC_WID(DAC_DATA_WID),
+	.ADDR_WID(CL_CAP_ADDR_WID),
+	.DECIMATE_WID(CL_CAP_DECIMATE_WID),
+	.TRIG_NUM(2),
+	.TRIG_SEL_WID(2)
+) cl_cap (
+	.clk(clk),
+	.rst_L(rst_L),
+	.sample(cl_cycle_done),
+	.z_measured(cl_z_measured),
+	.z_pos(cl_z_pos),
+	.trig_in({cl_sp_running, cl_change_made}),
+	.arm(cl_cap_arm),
+	.trig_sel(cl_cap_trig),
+	.decimate(cl_cap_decimate),
+	.last(cl_cap_last),
+	.triggered(cl_cap_triggered),
+	.finished(cl_cap_finished),
+	.count(cl_cap_count),
+	.read_addr(cl_cap_read_addr),
+	.read_measured(cl_cap_measured),
+	.read_pos(cl_cap_pos)
 );
 
 endmodule
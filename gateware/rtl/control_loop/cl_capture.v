@@ -0,0 +1,98 @@
+/* Copyright 2023 (C) Peter McGoron
+ * This file is a part of Upsilon, a free and open source software project.
+ * For license terms, refer to the files in `doc/copying` in the Upsilon
+ * source distribution.
+ */
+/* Capture buffer for control loop telemetry.
+ *
+ * Records the measured value and the DAC output of the control loop
+ * into a block RAM every "decimate" loop iterations. A loop iteration
+ * is signalled by a one cycle pulse on "sample".
+ *
+ * When armed, the module waits for a trigger. If "trig_sel" is 0 the
+ * capture starts immediately, otherwise it starts on the rising edge of
+ * trig_in[trig_sel - 1]. The first iteration after the trigger is always
+ * recorded. After the sample at index "last" is written, "finished" is
+ * raised and no more samples are recorded. Deassert "arm" to reset.
+ *
+ * The buffer is read out with "read_addr". The read is registered, so
+ * the outputs change one cycle after "read_addr".
+ */
+module cl_capture #(
+	parameter ADC_WID = 18,
+	parameter DAC_WID = 20,
+	parameter ADDR_WID = 10,
+	parameter DECIMATE_WID = 16,
+	parameter TRIG_NUM = 2,
+	parameter TRIG_SEL_WID = 2
+) (
+	input clk,
+	input rst_L,
+
+	input sample,
+	input [ADC_WID-1:0] z_measured,
+	input [DAC_WID-1:0] z_pos,
+	input [TRIG_NUM-1:0] trig_in,
+
+	input arm,
+	input [TRIG_SEL_WID-1:0] trig_sel,
+	input [DECIMATE_WID-1:0] decimate,
+	input [ADDR_WID-1:0] last,
+	output reg triggered,
+	output reg finished,
+	output reg [ADDR_WID:0] count,
+
+	input [ADDR_WID-1:0] read_addr,
+	output [ADC_WID-1:0] read_measured,
+	output [DAC_WID-1:0] read_pos
+);
+
+reg [ADC_WID+DAC_WID-1:0] buffer [(1 << ADDR_WID)-1:0];
+reg [ADC_WID+DAC_WID-1:0] read_word;
+
+initial triggered = 0;
+initial finished = 0;
+initial count = 0;
+initial read_word = 0;
+
+assign read_measured = read_word[ADC_WID-1:0];
+assign read_pos = read_word[ADC_WID+DAC_WID-1:ADC_WID];
+
+always @ (posedge clk) begin
+	read_word <= buffer[read_addr];
+end
+
+reg [TRIG_NUM-1:0] trig_prev;
+reg [DECIMATE_WID-1:0] dec_cnt;
+initial trig_prev = 0;
+initial dec_cnt = 0;
+
+wire [TRIG_NUM:0] trig_rise = {~trig_prev & trig_in, 1'b1};
+
+always @ (posedge clk) begin
+	trig_prev <= trig_in;
+	if (!rst_L || !arm) begin
+		triggered <= 0;
+		finished <= 0;
+		count <= 0;
+		dec_cnt <= 0;
+	end else if (!triggered) begin
+		if (trig_sel <= TRIG_NUM && trig_rise[trig_sel])
+			triggered <= 1;
+	end else if (!finished && sample) begin
+		if (dec_cnt == 0) begin
+			buffer[count[ADDR_WID-1:0]] <= {z_pos, z_measured};
+			count <= count + 1;
+			if (count[ADDR_WID-1:0] == last)
+				finished <= 1;
+		end
+
+		if (dec_cnt + 1 < decimate)
+			dec_cnt <= dec_cnt + 1;
+		else
+			dec_cnt <= 0;
+	end
+end
+
+endmodule
+`undefineall
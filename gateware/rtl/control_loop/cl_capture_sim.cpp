@@ -0,0 +1,116 @@
+/* Copyright 2023 (C) Peter McGoron
+ * This file is a part of Upsilon, a free and open source software project.
+ * For license terms, refer to the files in `doc/copying` in the Upsilon
+ * source distribution.
+ */
+#include <vector>
+#include <cstdlib>
+#include "Vcl_capture.h"
+#include "../testbench.hpp"
+
+constexpr unsigned ADC_WID = 18;
+constexpr unsigned DAC_WID = 20;
+
+double sc_time_stamp() {
+	return 0;
+}
+
+struct Sample {
+	int32_t measured;
+	int32_t pos;
+};
+
+class CaptureTestbench : public TB<Vcl_capture> {
+public:
+	std::vector<Sample> sent;
+
+	void loop_iteration();
+	void run_capture(unsigned trig_sel, unsigned decimate, unsigned last);
+	void check(unsigned decimate, unsigned last);
+	CaptureTestbench(int _bailout = 0) : TB<Vcl_capture>(_bailout)
+	                                   , sent{} {}
+};
+
+/* Simulate one control loop iteration, which takes a few cycles. */
+void CaptureTestbench::loop_iteration() {
+	Sample s = {mask_extend(rand(), ADC_WID), mask_extend(rand(), DAC_WID)};
+	mod.z_measured = s.measured & ((1 << ADC_WID) - 1);
+	mod.z_pos = s.pos & ((1 << DAC_WID) - 1);
+	mod.sample = 1;
+	run_clock();
+	mod.sample = 0;
+	if (mod.triggered)
+		sent.push_back(s);
+	for (int i = 0; i < 3; i++)
+		run_clock();
+}
+
+void CaptureTestbench::run_capture(unsigned trig_sel, unsigned decimate, unsigned last) {
+	sent.clear();
+	mod.trig_in = 0;
+	mod.trig_sel = trig_sel;
+	mod.decimate = decimate;
+	mod.last = last;
+	mod.arm = 1;
+	run_clock();
+
+	if (trig_sel != 0) {
+		for (int i = 0; i < 20; i++)
+			loop_iteration();
+		my_assert(!mod.triggered, "triggered early");
+		my_assert(mod.count == 0, "%d", mod.count);
+		/* Other trigger inputs are ignored. */
+		mod.trig_in = ~(1 << (trig_sel - 1)) & 3;
+		run_clock();
+		my_assert(!mod.triggered, "wrong trigger");
+		mod.trig_in |= 1 << (trig_sel - 1);
+		run_clock();
+	}
+	my_assert(mod.triggered, "not triggered");
+	sent.clear();
+
+	while (!mod.finished)
+		loop_iteration();
+	for (int i = 0; i < 20; i++)
+		loop_iteration();
+	my_assert(mod.count == last + 1, "%d != %u", mod.count, last + 1);
+
+	check(decimate, last);
+
+	mod.arm = 0;
+	run_clock();
+	my_assert(!mod.triggered && !mod.finished && mod.count == 0, "did not reset");
+}
+
+void CaptureTestbench::check(unsigned decimate, unsigned last) {
+	if (decimate == 0)
+		decimate = 1;
+	for (unsigned i = 0; i <= last; i++) {
+		mod.read_addr = i;
+		run_clock();
+		int32_t measured = mask_extend<int32_t>(mod.read_measured, ADC_WID);
+		int32_t pos = mask_extend<int32_t>(mod.read_pos, DAC_WID);
+		const Sample &s = sent[i*decimate];
+		my_assert(measured == s.measured, "(%u) %d != %d", i, measured, s.measured);
+		my_assert(pos == s.pos, "(%u) %d != %d", i, pos, s.pos);
+	}
+}
+
+int main(int argc, char *argv[]) {
+	Verilated::commandArgs(argc, argv);
+	Verilated::fatalOnError(false);
+
+	auto tb = CaptureTestbench();
+	tb.mod.rst_L = 1;
+	tb.mod.arm = 0;
+	tb.mod.sample = 0;
+	tb.run_clock();
+
+	tb.run_capture(0, 1, 99);
+	tb.run_capture(1, 0, 10);
+	tb.run_capture(2, 5, 200);
+	tb.run_capture(1, 3, (1 << 10) - 1);
+	tb.run_capture(0, 1, 0);
+
+	return 0;
+}
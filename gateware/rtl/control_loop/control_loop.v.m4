@@ -66,9 +66,18 @@ m4_define(M4_E_WID, (DAC_DATA_WID + 1))
 	input [M4_CONSTS_WID-1:0] I_in,
 	input [DELAY_WID-1:0] delay_in,
 
+	/* Setpoint from setpt_table. While setpt_table_en is high, the
+	 * setpoint is updated from setpt_table at the start of every
+	 * iteration, without a change handshake. */
+	input setpt_table_en,
+	input [ADC_WID-1:0] setpt_table,
+
 	output [CYCLE_COUNT_WID-1:0] cycle_count,
 	output [DAC_DATA_WID-1:0] z_pos,
-	output [ADC_WID-1:0] z_measured
+	output [ADC_WID-1:0] z_measured,
+	/* High for one cycle at the end of each iteration, when z_pos and
+	 * z_measured hold the values of that iteration. */
+	output cycle_done
 );
 
 /************ ADC and DAC modules ***************/
@@ -249,6 +258,7 @@ always @ (posedge clk) begin
 end
 
 assign in_loop = state != INIT_READ_FROM_DAC || running;
+assign cycle_done = state == WAIT_ON_DAC && dac_finished;
 
 /* Reset the change acknowledge interface after the master
  * stops its transfer.
@@ -331,6 +341,11 @@ always @ (posedge clk) begin
 				err_prev <= 0;
 			end
 
+			/* The integral term is kept so that the loop tracks
+			 * the trajectory smoothly. */
+			if (setpt_table_en)
+				setpt <= setpt_table;
+
 			state <= WAIT_ON_ADC;
 			timer <= 0;
 			adc_arm <= 1;
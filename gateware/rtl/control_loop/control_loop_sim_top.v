@@ -46,7 +46,8 @@ module control_loop_sim_top #(
 
 	output [CYCLE_COUNT_WID-1:0] cycle_count,
 	output [DAC_DATA_WID-1:0] z_pos,
-	output [ADC_WID-1:0] z_measured
+	output [ADC_WID-1:0] z_measured,
+	output cycle_done
 );
 
 /* Emulate a control loop environment with simulator controlled
@@ -141,9 +142,13 @@ control_loop #(
 	.I_in(I_in),
 	.delay_in(delay_in),
 
+	.setpt_table_en(1'b0),
+	.setpt_table({ADC_WID{1'b0}}),
+
 	.cycle_count(cycle_count),
 	.z_pos(z_pos),
-	.z_measured(z_measured)
+	.z_measured(z_measured),
+	.cycle_done(cycle_done)
 );
 
 `ifdef VERILATOR
@@ -0,0 +1,91 @@
+/* Copyright 2023 (C) Peter McGoron
+ * This file is a part of Upsilon, a free and open source software project.
+ * For license terms, refer to the files in `doc/copying` in the Upsilon
+ * source distribution.
+ */
+/* Setpoint trajectory table for the control loop.
+ *
+ * The table is a block RAM of setpoints loaded by the kernel. When
+ * armed, the module steps through the table from index 0 to "last",
+ * holding each setpoint for "interval" clock cycles (at least one). The control loop
+ * uses "setpt" as its setpoint while "running" is high, so the timing
+ * of setpoint changes does not depend on the speed of the CPU.
+ *
+ * Like the waveform module, the table is played once (then "running" is
+ * lowered and "finished" is raised) unless "loop" is set. Deassert "arm"
+ * to stop and rewind.
+ */
+module setpt_table #(
+	parameter DAT_WID = 18,
+	parameter ADDR_WID = 10,
+	parameter TIMER_WID = 32
+) (
+	input clk,
+	input rst_L,
+
+	/* Load interface. While load_write is high, load_data is written
+	 * to load_addr on every clock cycle. */
+	input [ADDR_WID-1:0] load_addr,
+	input [DAT_WID-1:0] load_data,
+	input load_write,
+
+	/* Playback interface. */
+	input arm,
+	input loop,
+	input [ADDR_WID-1:0] last,
+	input [TIMER_WID-1:0] interval,
+	output reg running,
+	output reg finished,
+	output reg [ADDR_WID-1:0] index,
+	output reg [DAT_WID-1:0] setpt
+);
+
+reg [DAT_WID-1:0] table_ram [(1 << ADDR_WID)-1:0];
+
+always @ (posedge clk) if (load_write) begin
+	table_ram[load_addr] <= load_data;
+end
+
+initial running = 0;
+initial finished = 0;
+initial index = 0;
+initial setpt = 0;
+
+reg [TIMER_WID-1:0] timer;
+initial timer = 0;
+
+/* The block RAM read is registered, so "setpt" changes one cycle after
+ * "index". The control loop reads "setpt" at most once per iteration,
+ * which takes much longer than one cycle. */
+always @ (posedge clk) begin
+	setpt <= table_ram[index];
+end
+
+always @ (posedge clk) if (!rst_L || !arm) begin
+	running <= 0;
+	finished <= 0;
+	index <= 0;
+	timer <= 0;
+end else if (!running) begin
+	/* Start playback. The setpoint at index 0 is held starting from
+	 * this cycle. */
+	if (!finished)
+		running <= 1;
+end else begin
+	if (timer + 1 < interval) begin
+		timer <= timer + 1;
+	end else begin
+		timer <= 0;
+		if (index != last) begin
+			index <= index + 1;
+		end else if (loop) begin
+			index <= 0;
+		end else begin
+			running <= 0;
+			finished <= 1;
+		end
+	end
+end
+
+endmodule
+`undefineall
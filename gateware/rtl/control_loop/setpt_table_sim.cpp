@@ -0,0 +1,119 @@
+/* Copyright 2023 (C) Peter McGoron
+ * This file is a part of Upsilon, a free and open source software project.
+ * For license terms, refer to the files in `doc/copying` in the Upsilon
+ * source distribution.
+ */
+#include <vector>
+#include <cstdlib>
+#include "Vsetpt_table.h"
+#include "../testbench.hpp"
+
+constexpr unsigned DAT_WID = 18;
+
+double sc_time_stamp() {
+	return 0;
+}
+
+class SetptTableTestbench : public TB<Vsetpt_table> {
+public:
+	std::vector<int32_t> table;
+
+	void load(size_t len);
+	void check_playback(unsigned interval, bool loop, int rounds);
+	SetptTableTestbench(int _bailout = 0) : TB<Vsetpt_table>(_bailout)
+	                                      , table{} {}
+};
+
+void SetptTableTestbench::load(size_t len) {
+	table.clear();
+	mod.load_write = 1;
+	for (size_t i = 0; i < len; i++) {
+		int32_t val = mask_extend(rand(), DAT_WID);
+		table.push_back(val);
+		mod.load_addr = i;
+		mod.load_data = val & ((1 << DAT_WID) - 1);
+		run_clock();
+	}
+	mod.load_write = 0;
+	mod.last = len - 1;
+}
+
+void SetptTableTestbench::check_playback(unsigned interval, bool loop, int rounds) {
+	mod.interval = interval;
+	mod.loop = loop;
+	mod.arm = 1;
+	if (interval == 0)
+		interval = 1;
+
+	/* Each setpoint is held for "interval" cycles, starting from the
+	 * cycle where "running" is raised. */
+	run_clock();
+	for (int r = 0; r < rounds; r++) {
+		for (size_t i = 0; i < table.size(); i++) {
+			for (unsigned t = 0; t < interval; t++) {
+				my_assert(mod.running, "(%zu) not running", i);
+				my_assert(mod.index == i, "%d != %zu", mod.index, i);
+				run_clock();
+			}
+		}
+	}
+
+	if (loop) {
+		my_assert(mod.running && mod.index == 0, "%d", mod.index);
+	} else {
+		my_assert(!mod.running && mod.finished, "did not finish");
+		for (int i = 0; i < 10; i++) {
+			run_clock();
+			my_assert(mod.finished, "finished dropped");
+			my_assert(mod.index == table.size() - 1, "%d", mod.index);
+		}
+		/* The last setpoint is held after playback ends. */
+		int32_t val = mask_extend<int32_t>(mod.setpt, DAT_WID);
+		my_assert(val == table.back(), "%d != %d", val, table.back());
+	}
+
+	mod.arm = 0;
+	run_clock();
+	my_assert(!mod.running && !mod.finished && mod.index == 0, "did not stop");
+}
+
+/* Check that "setpt" follows "index" one cycle behind. */
+static void check_values(SetptTableTestbench &tb) {
+	tb.mod.interval = 3;
+	tb.mod.loop = 0;
+	tb.mod.arm = 1;
+	tb.run_clock();
+	while (!tb.mod.finished) {
+		unsigned ind = tb.mod.index;
+		tb.run_clock();
+		int32_t val = mask_extend<int32_t>(tb.mod.setpt, DAT_WID);
+		my_assert(val == tb.table[ind], "(%u) %d != %d", ind, val, tb.table[ind]);
+	}
+	tb.mod.arm = 0;
+	tb.run_clock();
+}
+
+int main(int argc, char *argv[]) {
+	Verilated::commandArgs(argc, argv);
+	Verilated::fatalOnError(false);
+
+	auto tb = SetptTableTestbench();
+	tb.mod.rst_L = 1;
+	tb.mod.arm = 0;
+	tb.run_clock();
+
+	tb.load(100);
+	tb.check_playback(5, false, 1);
+	tb.check_playback(0, false, 1);
+	tb.check_playback(1, true, 3);
+	check_values(tb);
+
+	tb.load(1);
+	tb.check_playback(7, false, 1);
+
+	tb.load(1 << 10);
+	tb.check_playback(2, true, 2);
+	check_values(tb);
+
+	return 0;
+}
@@ -245,6 +245,8 @@ class UpsilonSoC(SoCCore):
         platform.add_source("rtl/control_loop/boothmul_preprocessed.v")
         platform.add_source("rtl/control_loop/control_loop_math.v")
         platform.add_source("rtl/control_loop/control_loop.v")
+        platform.add_source("rtl/control_loop/setpt_table.v")
+        platform.add_source("rtl/control_loop/cl_capture.v")
 #       platform.add_source("rtl/waveform/bram_interface_preprocessed.v")
 #       platform.add_source("rtl/waveform/waveform_preprocessed.v")
         platform.add_source("rtl/base/base.v")
@@ -0,0 +1,59 @@
+# Copyright 2023 (C) Peter McGoron
+#
+# This file is a part of Upsilon, a free and open source software project.
+# For license terms, refer to the files in `doc/copying` in the Upsilon
+# source distribution.
+#######################################################################
+#
+# Check that the accessors generated by csr2mp.py read back what they
+# write, using the fake board in fake_board.py.
+
+import mmio_descr
+from fake_board import load_mmio
+
+def reg(name):
+    return next(r for r in mmio_descr.registers if r.name == name)
+
+def test_64bit_word_order():
+    mmio, machine, csrh = load_mmio()
+    # LiteX CSRs are most significant word first.
+    addr = csrh.get_reg_addr(reg("cl_P_in"))
+    mmio.write_cl_P_in(0x123456789)
+    assert machine.mem32[addr] == 0x1
+    assert machine.mem32[addr + 4] == 0x23456789
+
+def test_roundtrip():
+    mmio, machine, csrh = load_mmio()
+    for r in mmio_descr.registers:
+        if r.rwperm == "read-only":
+            continue
+        if r.signed:
+            vals = [0, 1, -1, (1 << (r.blen - 1)) - 1, -(1 << (r.blen - 1))]
+        else:
+            vals = [0, 1, (1 << r.blen) - 1]
+        if r.blen > 32:
+            vals.append((1 << 32) | 5)
+        nums = [None] if r.num == 1 else range(r.num)
+        write = getattr(mmio, f"write_{r.name}")
+        read = getattr(mmio, f"read_{r.name}")
+        for num in nums:
+            for v in vals:
+                if num is None:
+                    write(v)
+                    got = read()
+                else:
+                    write(v, num)
+                    got = read(num)
+                assert got == v, (r.name, num, v, got)
+
+def test_scaled_roundtrip():
+    mmio, machine, csrh = load_mmio()
+    for r in mmio_descr.registers:
+        if r.frac == 0 or r.rwperm == "read-only":
+            continue
+        write = getattr(mmio, f"write_{r.name}_scaled")
+        read = getattr(mmio, f"read_{r.name}_scaled")
+        for v in [0.0006, -0.01, 1.5, -1000.25]:
+            write(v)
+            got = read()
+            assert abs(got - v) <= 1 / (1 << r.frac), (r.name, v, got)
@@ -5,6 +5,7 @@
 #
 # Upsilon Micropython Standard Library.
 
+import mmio
 from mmio import *
 
 # Write a 20 bit twos-complement value to a DAC.
@@ -41,8 +42,266 @@ def dac_init(num):
     write_dac_arm(0, num)
     return dac_read_reg(1 << 21, num)
 
-# Read a value from an ADC.
+# Read a signed value from an ADC.
 def adc_read(num):
     write_adc_arm(1, num)
     write_adc_arm(0, num)
-    return read_adc_recv_buf(num) 
+    return read_adc_recv_buf(num)
+
+# Load setpoints into the control loop setpoint table.
+def setpt_table_load(values, start=0):
+    """
+    Write setpoints into the setpoint table.
+
+    While ``cl_sp_load_write`` is high the table is written on every
+    clock cycle, so each entry takes two register writes.
+
+    :param values: Iterable of signed setpoints in ADC units.
+    :param start: Index of the first entry written.
+    :return: Index after the last entry written.
+    """
+    i = start
+    write_cl_sp_arm(0)
+    write_cl_sp_load_addr(i)
+    write_cl_sp_load_write(1)
+    for v in values:
+        write_cl_sp_load_addr(i)
+        write_cl_sp_load_data(v)
+        i += 1
+    write_cl_sp_load_write(0)
+    return i
+
+# Play the setpoint table through the control loop.
+def setpt_table_play(length, interval, loop=False):
+    """
+    Start playing the first ``length`` entries of the setpoint table,
+    holding each for ``interval`` clock cycles. The control loop must
+    already be running.
+    """
+    write_cl_sp_arm(0)
+    write_cl_sp_last(length - 1)
+    write_cl_sp_interval(interval)
+    write_cl_sp_loop(1 if loop else 0)
+    write_cl_sp_arm(1)
+
+# Stop playing the setpoint table. The control loop keeps the last
+# setpoint that was played.
+def setpt_table_stop():
+    write_cl_sp_arm(0)
+
+# Arm the control loop capture buffer.
+def capture_arm(length, decimate=1, trig=0):
+    """
+    Record ``length`` samples of ``cl_z_measured`` and ``cl_z_pos``,
+    one every ``decimate`` loop iterations, after the trigger ``trig``
+    (see ``cl_cap_trig``).
+    """
+    write_cl_cap_arm(0)
+    write_cl_cap_last(length - 1)
+    write_cl_cap_decimate(decimate)
+    write_cl_cap_trig(trig)
+    write_cl_cap_arm(1)
+
+# Read the control loop capture buffer.
+def capture_read(length):
+    """
+    Read the first ``length`` samples of the capture buffer.
+
+    :return: ``bytearray`` of little endian signed 32 bit
+      ``measured, pos`` pairs. Decode it with ``util.decode_capture``
+      on the client.
+    """
+    import struct
+    buf = bytearray(8*length)
+    for i in range(length):
+        write_cl_cap_read_addr(i)
+        struct.pack_into("<ii", buf, 8*i, read_cl_cap_measured(),
+                         read_cl_cap_pos())
+    return buf
+
+# Change the setpoint of the running control loop and record the response.
+def step_response(setpt, length, decimate=1):
+    """
+    Apply ``setpt`` with ``cl_assert_change`` and capture ``length``
+    samples starting with the change.
+
+    :return: Same as ``capture_read``.
+    :raises Exception: When the control loop is not running.
+    """
+    if not read_cl_in_loop():
+        raise Exception("control loop is not running")
+    capture_arm(length, decimate, trig=1)
+    write_cl_setpt_in(setpt)
+    write_cl_assert_change(1)
+    while not read_cl_change_made():
+        pass
+    write_cl_assert_change(0)
+    while not read_cl_cap_finished():
+        pass
+    buf = capture_read(length)
+    write_cl_cap_arm(0)
+    return buf
+
+# Convert a number to an exact fraction, so that it can be compared with
+# integer sums without floating point.
+def to_fraction(x):
+    """
+    :param x: Integer, float, or decimal string such as ``"0.25"`` or
+      ``"1e-06"``. Floats are rounded to a multiple of 1/65536.
+    :return: Tuple of integers ``(num, den)`` with ``num/den == x``.
+    """
+    if isinstance(x, str):
+        m, _, e = x.lower().partition("e")
+        whole, _, frac = m.partition(".")
+        num = int(whole + frac)
+        den = 10**len(frac)
+        e = int(e) if e else 0
+        if e >= 0:
+            return num * 10**e, den
+        return num, den * 10**-e
+    if isinstance(x, float):
+        return round(x * 65536), 65536
+    return x, 1
+
+# Step a DAC and read an ADC at each step.
+def noise_ramp(dac, adc, lo, hi, samples, reduce=True, decimate=0,
+               sem_target=None, min_samples=4, out=print):
+    """
+    Step a DAC through the codes ``lo`` to ``hi - 1`` and read the ADC
+    ``samples`` times at each step.
+
+    Without reduction every sample is printed as ``dac adc`` (with the
+    signed ADC value). With reduction the count, sum and sum of squares of
+    the ADC values are accumulated for each DAC code and one
+    line ``S dac count sum sumsq`` is printed per step.
+
+    :param reduce: Send summaries instead of every sample.
+    :param decimate: When reducing, also print every ``decimate``-th
+      sample as ``R dac adc``. ``0`` sends no raw samples.
+    :param sem_target: If not ``None``, sample each step adaptively:
+      stop once the standard error of the mean (in ADC units) is below
+      ``sem_target``, or after ``samples`` samples. The number of samples
+      taken is the count in the summary line. Requires ``reduce``. See
+      ``to_fraction`` for the accepted types.
+    :param min_samples: Minimum number of samples per step before the
+      standard error is checked in adaptive mode.
+    :param out: Function called with the fields of each line instead of
+      printing it.
+    :return: When reducing, a tuple of integer arrays (count, sum, sum of
+      squares) indexed by ``dac - lo``. Otherwise ``None``.
+    :raises Exception: When ``sem_target`` is given without ``reduce``.
+    """
+    from array import array
+    if sem_target is not None and not reduce:
+        raise Exception("adaptive sampling requires reduce")
+    if sem_target is not None:
+        # SEM^2 = (n*s2 - s*s) / (n*n*(n - 1)) and the target is num/den.
+        # Compare in integers, without division.
+        num, den = to_fraction(sem_target)
+        num2 = num * num
+        den2 = den * den
+    n = hi - lo
+    if reduce:
+        cnt = array('l', [0]*n)
+        acc = array('q', [0]*n)
+        acc2 = array('q', [0]*n)
+
+    k = 0
+    for i in range(lo, hi):
+        dac_write_volt(i, dac)
+        if not reduce:
+            for j in range(samples):
+                out(i, adc_read(adc))
+            continue
+
+        s = 0
+        s2 = 0
+        j = 0
+        while j < samples:
+            v = adc_read(adc)
+            s += v
+            s2 += v*v
+            j += 1
+            if decimate > 0:
+                if k == 0:
+                    out('R', i, v)
+                k += 1
+                if k == decimate:
+                    k = 0
+            if sem_target is not None and j >= min_samples \
+               and (j*s2 - s*s)*den2 < num2*j*j*(j - 1):
+                break
+        cnt[i - lo] = j
+        acc[i - lo] = s
+        acc2[i - lo] = s2
+        out('S', i, j, s, s2)
+
+    if reduce:
+        return cnt, acc, acc2
+
+# Print the accessor profile recorded by an mmio module generated with
+# "csr2mp.py --profile".
+def profile_dump():
+    """
+    Print call counts and time spent in each MMIO accessor, sorted by
+    total time.
+
+    :raises Exception: When ``mmio`` was generated without profiling.
+    """
+    if not hasattr(mmio, "PROFILE_NAMES"):
+        raise Exception("mmio was not generated with --profile")
+    rows = []
+    for i in range(len(mmio.PROFILE_NAMES)):
+        if mmio.PROFILE_COUNT[i] != 0:
+            rows.append((mmio.PROFILE_TIME[i], mmio.PROFILE_COUNT[i],
+                         mmio.PROFILE_NAMES[i]))
+    rows.sort(reverse=True)
+    print("name", "calls", "total_us", "avg_us")
+    for t, n, name in rows:
+        print(name, n, t, t // n)
+
+def profile_reset():
+    if not hasattr(mmio, "PROFILE_NAMES"):
+        raise Exception("mmio was not generated with --profile")
+    for i in range(len(mmio.PROFILE_NAMES)):
+        mmio.PROFILE_COUNT[i] = 0
+        mmio.PROFILE_TIME[i] = 0
+
+# Save the access log recorded by an mmio module generated with
+# "csr2mp.py --trace". Analyze the file with client/mmio_trace.py.
+def trace_dump(fname):
+    """
+    Write the trace ring buffer to a file, oldest record first.
+
+    The file starts with ``b"UPTR"``, then a little endian u16 version,
+    u32 record size, u32 record count, u32 ``ticks_us`` period and u16
+    name count, followed by the accessor names (u8 length and name) and
+    the records.
+
+    :raises Exception: When ``mmio`` was generated without tracing.
+    """
+    import struct
+    import time
+    if not hasattr(mmio, "TRACE_NAMES"):
+        raise Exception("mmio was not generated with --trace")
+    pos = mmio.TRACE_POS[0]
+    count = mmio.TRACE_POS[1]
+    rec = mmio.TRACE_REC
+    period = time.ticks_add(0, -1) + 1
+    with open(fname, "wb") as f:
+        f.write(b"UPTR")
+        f.write(struct.pack("<HIIIH", 1, rec, min(count, mmio.TRACE_LEN),
+                            period, len(mmio.TRACE_NAMES)))
+        for n in mmio.TRACE_NAMES:
+            f.write(struct.pack("<B", len(n)))
+            f.write(n.encode())
+        mv = memoryview(mmio.TRACE_BUF)
+        if count >= mmio.TRACE_LEN:
+            f.write(mv[pos*rec:])
+        f.write(mv[:pos*rec])
+
+def trace_reset():
+    if not hasattr(mmio, "TRACE_NAMES"):
+        raise Exception("mmio was not generated with --trace")
+    mmio.TRACE_POS[0] = 0
+    mmio.TRACE_POS[1] = 0
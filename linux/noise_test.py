@@ -1,10 +1,15 @@
 from comm import *
-from time import sleep_ms
+from sys import argv
+
+# Usage: micropython noise_test.py [raw|reduce] [decimate]
+#        micropython noise_test.py adaptive sem_target [max_samples]
+mode = argv[1] if len(argv) > 1 else "raw"
 
 dac_init(0)
 write_adc_sel(0,0)
-for i in range(-300,300):
-    dac_write_volt(i, 0)
-    for j in range(0,20):
-        print(i, adc_read(0))
-
+if mode == "adaptive":
+    cap = int(argv[3]) if len(argv) > 3 else 200
+    noise_ramp(0, 0, -300, 300, cap, sem_target=argv[2])
+else:
+    decimate = int(argv[2]) if len(argv) > 2 else 0
+    noise_ramp(0, 0, -300, 300, 20, reduce=(mode == "reduce"), decimate=decimate)
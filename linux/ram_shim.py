@@ -0,0 +1,180 @@
+# Copyright 2023 (C) Peter McGoron
+# This file is a part of Upsilon, a free and open source software project.
+# For license terms, refer to the files in `doc/copying` in the Upsilon
+# source distribution.
+#
+# Reader for the ram_shim DMA buffer.
+#
+# The ram_shim module (gateware/rtl/raster/ram_shim.v) writes each sample
+# into system RAM as two 16 bit words: the low 16 bits first and then the
+# sign extended high bits. Each sample therefore occupies one little endian
+# 32 bit twos-complement word in memory.
+#
+# The buffer is copied out of a character device (``/dev/mem`` or a UIO
+# device) with ``seek`` and ``readinto`` into a preallocated buffer. Data
+# is forwarded in large chunks using ``memoryview`` slices, so no
+# per-sample Python objects are made.
+#
+# Usage: micropython ram_shim.py start length ptr [dev [offset]]
+#
+# Samples are forwarded to standard output until the script is killed.
+# ``ptr`` is where the shim write pointer is read from: either the name of
+# an mmio register (read with ``read_<ptr>``), or the address of a 32 bit
+# word in ``dev``. Numbers may be given in hex with a ``0x`` prefix.
+#
+# This file runs under both Micropython and CPython.
+
+import sys
+import struct
+
+try:
+    from time import sleep_ms
+except ImportError:
+    from time import sleep
+    def sleep_ms(ms):
+        sleep(ms / 1000)
+
+SAMPLE_BYTES = 4
+
+class RamShimReader:
+    """
+    Track the read side of a ram_shim ring buffer.
+
+    The shim wraps around after it writes the word at offset
+    ``loc_len - 1``. Program the shim with ``RAM_SHIM_WRITE_LEN`` set to
+    ``shim_len`` so that the ring buffer is exactly ``length`` bytes.
+    """
+
+    def __init__(self, read_ptr, start, length, dev="/dev/mem",
+                 offset=None, chunk=16384):
+        """
+        :param read_ptr: Function that returns the result of the
+          ``RAM_SHIM_READ_PTR`` command, i.e. the address the shim will
+          write to next.
+        :param start: Physical address of the buffer (``RAM_SHIM_WRITE_LOC``).
+        :param length: Length of the buffer in bytes. Must be a multiple
+          of ``SAMPLE_BYTES``.
+        :param dev: Device the buffer is read from. ``/dev/mem`` is indexed
+          by physical address. A UIO device is indexed from zero: pass
+          ``offset=0``.
+        :param offset: Offset of the start of the buffer in ``dev``.
+          Defaults to ``start``.
+        :param chunk: Size of the transfer buffer in bytes.
+        :raises Exception: When ``length`` or ``chunk`` are not
+          multiples of ``SAMPLE_BYTES``.
+        """
+        if length % SAMPLE_BYTES != 0 or chunk % SAMPLE_BYTES != 0:
+            raise Exception("length and chunk must be multiples of 4")
+        self.read_ptr = read_ptr
+        self.start = start
+        self.length = length
+        self.shim_len = length - 1
+        if offset is None:
+            offset = start
+        self.offset = offset
+        # Unbuffered, so that every read sees what the shim wrote.
+        self.f = open(dev, "rb", buffering=0)
+        self.buf = bytearray(chunk)
+        self.mv = memoryview(self.buf)
+        self.rd = 0
+
+    def close(self):
+        self.f.close()
+
+    def write_offset(self):
+        """
+        :return: Offset of the last complete sample written by the shim.
+        """
+        wr = self.read_ptr() - self.start
+        # The shim writes the low word first. A sample is only complete
+        # once both words are written.
+        return wr - wr % SAMPLE_BYTES
+
+    def _copy(self, lo, hi, out):
+        """
+        :raises Exception: When the device returns less data than the
+          buffer length.
+        """
+        self.f.seek(self.offset + lo)
+        while lo < hi:
+            n = hi - lo
+            if n > len(self.buf):
+                n = len(self.buf)
+            n = self.f.readinto(self.mv[:n])
+            if not n:
+                raise Exception("short read at offset %d" % (self.offset + lo))
+            out.write(self.mv[:n])
+            lo += n
+
+    def poll(self, out):
+        """
+        Forward all samples written since the last call.
+
+        This function cannot detect if the shim has overwritten data
+        that has not been read yet. Poll at least once per buffer length.
+
+        :param out: Object with a ``write`` method that accepts a
+          ``memoryview``.
+        :return: Number of bytes forwarded.
+        """
+        wr = self.write_offset()
+        rd = self.rd
+        if wr == rd:
+            return 0
+        if wr < rd:
+            self._copy(rd, self.length, out)
+            n = self.length - rd + wr
+            rd = 0
+        else:
+            n = wr - rd
+        self._copy(rd, wr, out)
+        self.rd = wr
+        return n
+
+    def run(self, out=None, idle_ms=1, stop=None):
+        """
+        Forward samples until ``stop()`` returns true.
+
+        :param out: Output stream. Defaults to standard output.
+        :param idle_ms: Time to sleep when no data is available.
+        :param stop: Function with no arguments. If ``None``, run forever.
+        """
+        if out is None:
+            out = sys.stdout.buffer
+        while stop is None or not stop():
+            if self.poll(out) == 0:
+                sleep_ms(idle_ms)
+        self.poll(out)
+
+def ptr_source(ptr, dev):
+    """
+    :param ptr: Name of an mmio register, or address of a 32 bit little
+      endian word in ``dev``.
+    :return: Function that reads the shim write pointer.
+    """
+    try:
+        addr = int(ptr, 0)
+    except ValueError:
+        import mmio
+        return getattr(mmio, "read_" + ptr)
+    f = open(dev, "rb", buffering=0)
+    b = bytearray(4)
+    def read():
+        f.seek(addr)
+        f.readinto(b)
+        return struct.unpack("<I", b)[0]
+    return read
+
+def main(argv):
+    start = int(argv[1], 0)
+    length = int(argv[2], 0)
+    dev = argv[4] if len(argv) > 4 else "/dev/mem"
+    offset = int(argv[5], 0) if len(argv) > 5 else None
+    r = RamShimReader(ptr_source(argv[3], dev), start, length, dev, offset)
+    try:
+        r.run()
+    finally:
+        r.close()
+
+if __name__ == "__main__":
+    main(sys.argv)
@@ -0,0 +1,159 @@
+# Copyright 2023 (C) Peter McGoron
+# This file is a part of Upsilon, a free and open source software project.
+# For license terms, refer to the files in `doc/copying` in the Upsilon
+# source distribution.
+#
+# Batched register operation server.
+#
+# The client sends batches of register reads, writes and waits. The
+# server executes each batch with the mmio accessors and sends all results
+# back in one reply. This file runs under both Micropython and CPython, so
+# that the client can run it locally against a fake register file.
+#
+# All integers are little endian.
+#
+# Session start: the client sends the register table. This is a u16 count
+# followed by, for each register, a u8 name length and the name. Operations
+# refer to registers by their index in this table. The server replies with
+# a u16 count of registers it has accessors for.
+#
+# Batch: a u16 operation count followed by that many operations:
+#
+#   u8 op, u8 register index, u8 register number (NONUM if the register
+#   has no numerical suffix), i64 value, u32 timeout in milliseconds.
+#
+# Reply: u8 status, u16 result count, and one i64 per executed operation.
+# Reads return the value read, writes return 0, and waits return the
+# number of milliseconds waited. Execution stops at the first failed
+# operation. An operation count of zero ends the session.
+
+import struct
+
+try:
+    from time import ticks_ms, ticks_diff
+except ImportError:
+    from time import monotonic
+    def ticks_ms():
+        return int(monotonic() * 1000)
+    def ticks_diff(a, b):
+        return a - b
+
+OP_READ = 0
+OP_WRITE = 1
+OP_WAIT = 2
+
+NONUM = 0xFF
+
+STATUS_OK = 0
+STATUS_ERROR = 1
+STATUS_TIMEOUT = 2
+
+OP_FMT = "<BBBqI"
+OP_LEN = struct.calcsize(OP_FMT)
+REPLY_FMT = "<BH"
+
+def readn(inp, n):
+    """ Read exactly ``n`` bytes. Returns ``None`` on end of file. """
+    b = bytearray(n)
+    mv = memoryview(b)
+    i = 0
+    while i < n:
+        r = inp.readinto(mv[i:])
+        if not r:
+            return None
+        i += r
+    return b
+
+def to_i64(v):
+    v &= 0xFFFFFFFFFFFFFFFF
+    if v >> 63:
+        v -= 1 << 64
+    return v
+
+def mmio_lookup(name):
+    """ Find the ``mmio`` accessors for a register. """
+    import mmio
+    return getattr(mmio, "read_" + name, None), getattr(mmio, "write_" + name, None)
+
+def read_table(inp, lookup):
+    b = readn(inp, 2)
+    if b is None:
+        return None
+    n = struct.unpack("<H", b)[0]
+    table = []
+    for i in range(n):
+        l = readn(inp, 1)[0]
+        table.append(lookup(bytes(readn(inp, l)).decode()))
+    return table
+
+def _call(f, num, *args):
+    if num == NONUM:
+        return f(*args)
+    return f(*(args + (num,)))
+
+def run_batch(table, ops):
+    """
+    Execute a list of unpacked operations.
+
+    :return: Tuple of status and list of results.
+    """
+    res = []
+    for op, reg, num, val, timeout in ops:
+        try:
+            read, write = table[reg]
+            if op == OP_READ:
+                res.append(to_i64(_call(read, num)))
+            elif op == OP_WRITE:
+                _call(write, num, val)
+                res.append(0)
+            elif op == OP_WAIT:
+                start = ticks_ms()
+                while to_i64(_call(read, num)) != val:
+                    if ticks_diff(ticks_ms(), start) > timeout:
+                        return STATUS_TIMEOUT, res
+                res.append(ticks_diff(ticks_ms(), start))
+            else:
+                return STATUS_ERROR, res
+        except Exception:
+            return STATUS_ERROR, res
+    return STATUS_OK, res
+
+def serve(inp, out, lookup=mmio_lookup):
+    """
+    Serve one session.
+
+    :param inp: Binary input stream.
+    :param out: Binary output stream.
+    :param lookup: Function that takes a register name and returns a
+      tuple of the read and write accessors. Missing accessors are
+      ``None``.
+    """
+    table = read_table(inp, lookup)
+    if table is None:
+        return
+    out.write(struct.pack("<H", len([t for t in table if t[0] is not None])))
+    out.flush()
+
+    while True:
+        b = readn(inp, 2)
+        if b is None:
+            return
+        n = struct.unpack("<H", b)[0]
+        if n == 0:
+            return
+        b = readn(inp, n * OP_LEN)
+        ops = [struct.unpack_from(OP_FMT, b, i * OP_LEN) for i in range(n)]
+        status, res = run_batch(table, ops)
+
+        reply = bytearray(struct.calcsize(REPLY_FMT) + 8 * len(res))
+        struct.pack_into(REPLY_FMT, reply, 0, status, len(res))
+        i = struct.calcsize(REPLY_FMT)
+        for v in res:
+            struct.pack_into("<q", reply, i, v)
+            i += 8
+        out.write(reply)
+        out.flush()
+
+if __name__ == "__main__":
+    import sys
+    serve(sys.stdin.buffer, sys.stdout.buffer)
@@ -0,0 +1,13 @@
+from comm import *
+import sys
+
+# Usage: micropython step_response.py setpt length [decimate]
+#
+# Change the setpoint of a running control loop and record its
+# response. The samples are written to standard output in the format
+# of comm.capture_read.
+setpt = int(sys.argv[1])
+length = int(sys.argv[2])
+decimate = int(sys.argv[3]) if len(sys.argv) > 3 else 1
+
+sys.stdout.buffer.write(step_response(setpt, length, decimate))
@@ -0,0 +1,36 @@
+# Copyright 2023 (C) Peter McGoron
+# This file is a part of Upsilon, a free and open source software project.
+# For license terms, refer to the files in `doc/copying` in the Upsilon
+# source distribution.
+#
+# Apply a waveform patch made by client/waveform.py to system RAM.
+#
+# Usage: micropython waveform_load.py patchfile start_addr
+#
+# worker.py applies patches with the "waveform" job, without starting this
+# script.
+#
+# The patch is a list of records. Each record is a little endian 32 bit
+# byte offset from start_addr, a 32 bit byte length, and the data.
+
+import struct
+from sys import argv
+
+def apply_patch(patch, start_addr, dev="/dev/mem"):
+    """
+    :param patch: Bytes-like patch.
+    :param start_addr: Address of the waveform in ``dev``.
+    """
+    mv = memoryview(patch)
+    with open(dev, "r+b") as f:
+        i = 0
+        while i < len(patch):
+            off, length = struct.unpack_from("<II", patch, i)
+            i += 8
+            f.seek(start_addr + off)
+            f.write(mv[i:i + length])
+            i += length
+
+if __name__ == "__main__":
+    with open(argv[1], "rb") as f:
+        apply_patch(f.read(), int(argv[2]))
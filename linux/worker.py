@@ -0,0 +1,200 @@
+# Copyright 2023 (C) Peter McGoron
+# This file is a part of Upsilon, a free and open source software project.
+# For license terms, refer to the files in `doc/copying` in the Upsilon
+# source distribution.
+#
+# Resident job runner for client/scheduler.py.
+#
+# The worker reads jobs from standard input, one JSON object per line:
+#
+#   {"id": 1, "type": "noise", "params": {"lo": -300, "hi": 300}}
+#
+# and runs them in order. Because the worker stays running between jobs,
+# jobs start without reconnecting, and DACs are only initialized once
+# (or when a job sets "reinit"). A line {"type": "quit"} or end of file
+# stops the worker.
+#
+# Output is one JSON object per line. The worker first sends
+# {"ready": true, "jobs": [...]} with the job types it supports. For each
+# job it sends
+#
+#   {"id": 1, "columns": {"dac": "i4", ...}}     column names and dtypes
+#   {"id": 1, "rows": {"dac": [...], ...}}       zero or more times
+#   {"id": 1, "done": true, "error": null}       error is a string on failure
+#
+# This file runs under both Micropython and CPython, so that the client
+# can run it locally against a fake register file.
+
+import sys
+import json
+import struct
+from binascii import a2b_base64
+from comm import *
+from waveform_load import apply_patch
+
+try:
+    from time import ticks_ms, ticks_diff, sleep_ms
+except ImportError:
+    from time import monotonic, sleep
+    def ticks_ms():
+        return int(monotonic() * 1000)
+    def ticks_diff(a, b):
+        return a - b
+    def sleep_ms(ms):
+        sleep(ms / 1000)
+
+# Rows sent in each "rows" message.
+ROWS = 256
+
+class Emitter:
+    """ Buffer rows of one job and send them in blocks of ``ROWS``. """
+    def __init__(self, send, jid, columns):
+        """
+        :param columns: List of ``(name, dtype)`` tuples.
+        """
+        self.send = send
+        self.jid = jid
+        self.names = [c[0] for c in columns]
+        self.cols = [[] for c in columns]
+        send({"id": jid, "columns": dict(columns)})
+
+    def row(self, *vals):
+        for c, v in zip(self.cols, vals):
+            c.append(v)
+        if len(self.cols[0]) >= ROWS:
+            self.flush()
+
+    def flush(self):
+        if len(self.cols[0]) == 0:
+            return
+        self.send({"id": self.jid, "rows": dict(zip(self.names, self.cols))})
+        self.cols = [[] for c in self.cols]
+
+class Worker:
+    def __init__(self, send):
+        self.send = send
+        self.dacs_ready = set()
+        self.jobs = {
+            "noise": self.noise,
+            "control_loop": self.control_loop,
+            "step": self.step,
+            "waveform": self.waveform,
+        }
+
+    def ensure_dac(self, num, reinit=False):
+        """ Initialize a DAC unless an earlier job already did. """
+        if reinit or num not in self.dacs_ready:
+            dac_init(num)
+            self.dacs_ready.add(num)
+
+    def noise(self, jid, p):
+        """
+        Noise ramp (see ``comm.noise_ramp``). Parameters: dac, adc, lo,
+        hi, samples, sem_target.
+        """
+        dac = p.get("dac", 0)
+        adc = p.get("adc", 0)
+        self.ensure_dac(dac, p.get("reinit", False))
+        write_dac_sel(0, dac)
+        write_adc_sel(0, adc)
+
+        e = Emitter(self.send, jid, [("dac", "i4"), ("n", "i4"),
+                                     ("sum", "i8"), ("sumsq", "i8")])
+        def out(*l):
+            if l[0] == 'S':
+                e.row(l[1], l[2], l[3], l[4])
+        noise_ramp(dac, adc, p.get("lo", -300), p.get("hi", 300),
+                   p.get("samples", 20), sem_target=p.get("sem_target"),
+                   out=out)
+        e.flush()
+
+    def control_loop(self, jid, p):
+        """
+        Start the control loop with new parameters and record
+        ``cl_z_measured`` and ``cl_z_pos`` every ``interval_ms``
+        milliseconds. Parameters: setpt, P, I (fixed point integers),
+        delay, samples, interval_ms, stop.
+        """
+        self.ensure_dac(0, p.get("reinit", False))
+        write_dac_sel(1 << 1, 0)
+        write_adc_sel(1 << 2, 0)
+        write_cl_setpt_in(p.get("setpt", 0))
+        write_cl_P_in(p["P"])
+        write_cl_I_in(p["I"])
+        write_cl_delay_in(p.get("delay", 100))
+        write_cl_run_loop_in(1)
+        write_cl_assert_change(1)
+        while not read_cl_change_made():
+            pass
+        write_cl_assert_change(0)
+
+        e = Emitter(self.send, jid, [("t_ms", "i4"), ("measured", "i4"),
+                                     ("pos", "i4")])
+        start = ticks_ms()
+        for i in range(p.get("samples", 0)):
+            e.row(ticks_diff(ticks_ms(), start), read_cl_z_measured(),
+                  read_cl_z_pos())
+            sleep_ms(p.get("interval_ms", 10))
+        e.flush()
+
+        if p.get("stop", False):
+            write_cl_run_loop_in(0)
+            write_dac_sel(0, 0)
+            write_adc_sel(0, 0)
+
+    def step(self, jid, p):
+        """
+        Step response of the running control loop (see
+        ``comm.step_response``). Parameters: setpt, length, decimate.
+        """
+        length = p.get("length", 1024)
+        buf = step_response(p["setpt"], length, p.get("decimate", 1))
+        e = Emitter(self.send, jid, [("measured", "i4"), ("pos", "i4")])
+        for i in range(length):
+            e.row(*struct.unpack_from("<ii", buf, 8*i))
+        e.flush()
+
+    def waveform(self, jid, p):
+        """
+        Apply a waveform patch made by ``client/waveform.py`` (see
+        ``waveform_load.py``). Parameters: start_addr, patch (base64),
+        dev.
+        """
+        apply_patch(a2b_base64(p["patch"]), p["start_addr"],
+                    p.get("dev", "/dev/mem"))
+
+    def run(self, job):
+        jid = job.get("id")
+        err = None
+        try:
+            f = self.jobs.get(job.get("type"))
+            if f is None:
+                raise Exception("unknown job type " + str(job.get("type")))
+            f(jid, job.get("params", {}))
+        except Exception as ex:
+            err = "%s: %s" % (type(ex).__name__, ex)
+        self.send({"id": jid, "done": True, "error": err})
+
+def serve(inp, out):
+    """
+    Run jobs read from the text stream ``inp`` until end of file or a
+    "quit" job, writing messages to ``out``.
+    """
+    def send(msg):
+        out.write(json.dumps(msg))
+        out.write("\n")
+        out.flush()
+
+    w = Worker(send)
+    send({"ready": True, "jobs": list(w.jobs)})
+    while True:
+        line = inp.readline()
+        if not line:
+            break
+        job = json.loads(line)
+        if job.get("type") == "quit":
+            break
+        w.run(job)
+
+if __name__ == "__main__":
+    serve(sys.stdin, sys.stdout)